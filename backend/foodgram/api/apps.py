@@ -1,5 +1,32 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from rest_framework.authtoken.models import Token
+
+        from api.authentication import token_deleted, user_changed
+        from api.documents import (author_changed, ingredient_changed,
+                                   recipe_changed, relation_changed,
+                                   tag_changed)
+        from api.pagination import recipe_counts
+        from food.models import (Favorite, Ingredient, IngredientRecipe,
+                                 Recipe, ShoppingCart, Tag, TagRecipe)
+        from users.models import User
+
+        post_save.connect(recipe_changed, sender=Recipe)
+        for model in (TagRecipe, IngredientRecipe):
+            post_save.connect(relation_changed, sender=model)
+            post_delete.connect(relation_changed, sender=model)
+        post_save.connect(author_changed, sender=User)
+        post_save.connect(user_changed, sender=User)
+        post_delete.connect(user_changed, sender=User)
+        post_delete.connect(token_deleted, sender=Token)
+        post_save.connect(tag_changed, sender=Tag)
+        post_save.connect(ingredient_changed, sender=Ingredient)
+        for model in (Recipe, TagRecipe, Favorite, ShoppingCart):
+            post_save.connect(recipe_counts.invalidate, sender=model)
+            post_delete.connect(recipe_counts.invalidate, sender=model)
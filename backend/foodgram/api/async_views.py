@@ -0,0 +1,307 @@
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import Page
+from django.db import connections
+from django.db.models import F
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.authentication import CachedTokenAuthentication
+from api.documents import attach_documents, build_documents
+from api.pagination import CountedPaginator
+from api.renderers import (ShoppingListCSVRenderer, ShoppingListJSONRenderer,
+                           ShoppingListTxtRenderer)
+from api.serializers import (IngredientSerializer, RecipeSerializer,
+                             TagSerializer, load_subscriptions)
+from api.views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                       get_ShoppingCart)
+from food.catalog import ingredient_catalog, tag_registry
+from food.models import Recipe, ShoppingListItem
+from foodgram.middleware import token_key
+from users.models import Subscription
+
+
+def isolated(func):
+    """
+    func для потока из общего пула: соединения с базой, открытые
+    в нём, закрываются сразу, а не остаются висеть в потоке пула.
+    """
+    @functools.wraps(func)
+    def call():
+        try:
+            return func()
+        finally:
+            connections.close_all()
+    return call
+
+
+async def gather(*funcs):
+    """
+    Выполняет независимые синхронные функции (запросы к базе)
+    одновременно: первую в потоке запроса, остальные в пуле потоков.
+    Возвращает их результаты по порядку.
+    """
+    first, *rest = funcs
+    return await asyncio.gather(
+        sync_to_async(first)(),
+        *(
+            sync_to_async(isolated(func), thread_sensitive=False)()
+            for func in rest
+        ),
+    )
+
+
+async def authenticate(request):
+    """
+    DRF Request с пользователем по токену. Недавно проверенный
+    пользователь берётся из token_cache без потока, иначе версия
+    сверяется с кэшем и при промахе пользователь загружается в потоке.
+    None, если заголовок или токен неверные.
+    """
+    user = AnonymousUser()
+    token = None
+    if request.META.get('HTTP_AUTHORIZATION'):
+        key = token_key(request)
+        if key is None:
+            return None
+        authentication = CachedTokenAuthentication()
+        credentials = authentication.peek_cached(key)
+        if credentials is None:
+            try:
+                credentials = await sync_to_async(
+                    authentication.authenticate_credentials
+                )(key)
+            except APIException:
+                return None
+        user, token = credentials
+    drf_request = Request(request)
+    drf_request.user = user
+    drf_request.auth = token
+    return drf_request
+
+
+def wants_html(request):
+    """Запрос browsable API из браузера."""
+    return (
+        request.GET.get('format') == 'api'
+        or 'text/html' in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+def json_response(data):
+    """Ответ в том же JSON, что у DRF Response."""
+    response = HttpResponse(
+        JSONRenderer().render(data), content_type='application/json'
+    )
+    response['Vary'] = 'Accept'
+    return response
+
+
+def async_view(sync_view):
+    """
+    Асинхронная версия sync_view для GET-запросов.
+    Обработчик получает DRF Request с пользователем и возвращает ответ
+    или None, если запрос должен обработать sync_view: ошибки (404,
+    неверный токен), browsable API и остальные методы идут в sync_view
+    в потоке, ответы совпадают с синхронной версией.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method == 'GET' and not wants_html(request):
+                drf_request = await authenticate(request)
+                if drf_request is not None:
+                    response = await handler(drf_request, *args, **kwargs)
+                    if response is not None:
+                        return response
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+def positive_int(value):
+    return int(value) if value.isdigit() and int(value) > 0 else None
+
+
+@async_view(RecipeViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def recipe_list(request):
+    """
+    Список рецептов: число рецептов и страница загружаются одновременно,
+    затем одновременно подписки на авторов и недостающие документы.
+    """
+    viewset = RecipeViewSet(
+        request=request, args=(), kwargs={}, action='list', format_kwarg=None
+    )
+    pagination = viewset.paginator
+    if pagination.cursor_query_param in request.query_params:
+        return None
+    number = positive_int(
+        request.query_params.get(pagination.page_query_param, '1')
+    )
+    if number is None:
+        return None
+    page_size = pagination.get_page_size(request)
+    bottom = (number - 1) * page_size
+    # Фильтр тегов может загрузить справочник тегов из базы.
+    try:
+        queryset = await sync_to_async(
+            lambda: viewset.filter_queryset(viewset.get_queryset())
+        )()
+    except (APIException, DjangoValidationError):
+        # Ответ с ошибкой фильтров (400) формирует DRF.
+        return None
+    count_strategy = getattr(
+        viewset, 'count_strategy', pagination.count_strategy
+    )
+    count, recipes = await gather(
+        lambda: count_strategy.count(queryset, request),
+        lambda: list(queryset[bottom:bottom + page_size]),
+    )
+    paginator = CountedPaginator(
+        queryset, page_size, counter=lambda queryset: count
+    )
+    if number > paginator.num_pages:
+        return None
+    author_ids = {recipe.author_id for recipe in recipes}
+    loads = []
+    if request.user.is_authenticated:
+        loads.append(lambda: load_subscriptions(request, author_ids))
+    else:
+        # Для анонима без запроса к базе.
+        load_subscriptions(request, author_ids)
+    if any(getattr(recipe, 'document', None) is None for recipe in recipes):
+        loads.append(lambda: attach_documents(recipes))
+    if loads:
+        await gather(*loads)
+    pagination.request = request
+    pagination.keyset = None
+    pagination.page = Page(recipes, number, paginator)
+    data = RecipeSerializer(
+        recipes, many=True, context=viewset.get_serializer_context()
+    ).data
+    return json_response(pagination.get_paginated_response(data).data)
+
+
+@async_view(RecipeViewSet.as_view({
+    'get': 'retrieve', 'put': 'update',
+    'patch': 'partial_update', 'delete': 'destroy',
+}))
+async def recipe_detail(request, pk):
+    """
+    Рецепт: сам рецепт и подписка на его автора загружаются
+    одновременно, подписка - по id рецепта, не дожидаясь автора.
+    """
+    # Фильтры списка применяются и к одному рецепту, это путь DRF.
+    if request.query_params or not pk.isdigit():
+        return None
+    user = request.user
+    lookups = [
+        lambda: Recipe.objects.with_user_flags(user).select_related(
+            'document'
+        ).filter(pk=pk).first()
+    ]
+    if user.is_authenticated:
+        lookups.append(
+            lambda: Subscription.objects.filter(
+                user=user, subscriber__recipes=pk
+            ).exists()
+        )
+    recipe, *subscribed = await gather(*lookups)
+    if recipe is None:
+        return None
+    request._subscriptions = {recipe.author_id: any(subscribed)}
+    if getattr(recipe, 'document', None) is None:
+        recipe.document = (
+            await sync_to_async(build_documents)((recipe.id,))
+        )[recipe.id]
+    return json_response(
+        RecipeSerializer(recipe, context={'request': request}).data
+    )
+
+
+@async_view(IngredientViewSet.as_view({'get': 'list'}))
+async def ingredient_list(request):
+    """Поиск ингридиентов по справочнику в памяти, без потока."""
+    snapshot = await ingredient_catalog.asnapshot()
+    name = request.query_params.get('name')
+    if name is None:
+        ingredients = ingredient_catalog.all(snapshot)
+    else:
+        ingredients = ingredient_catalog.search(name, snapshot)
+    return json_response(IngredientSerializer(ingredients, many=True).data)
+
+
+@async_view(IngredientViewSet.as_view({'get': 'retrieve'}))
+async def ingredient_detail(request, pk):
+    if not pk.isdigit():
+        return None
+    snapshot = await ingredient_catalog.asnapshot()
+    ingredient = ingredient_catalog.get(int(pk), snapshot)
+    if ingredient is None:
+        return None
+    return json_response(IngredientSerializer(ingredient).data)
+
+
+@async_view(TagViewSet.as_view({'get': 'list'}))
+async def tag_list(request):
+    """Теги из справочника в памяти, без потока."""
+    snapshot = await tag_registry.asnapshot()
+    return json_response(
+        TagSerializer(tag_registry.all(snapshot), many=True).data
+    )
+
+
+@async_view(TagViewSet.as_view({'get': 'retrieve'}))
+async def tag_detail(request, pk):
+    if not pk.isdigit():
+        return None
+    snapshot = await tag_registry.asnapshot()
+    tag = tag_registry.get(int(pk), snapshot)
+    if tag is None:
+        return None
+    return json_response(TagSerializer(tag).data)
+
+
+@async_view(get_ShoppingCart)
+async def download_shopping_cart(request):
+    """
+    Список покупок в txt, csv или json. Django 3.2 под ASGI перебирает
+    потоковый ответ в цикле событий, где нельзя обращаться к базе,
+    поэтому строки загружаются в потоке и отдаются одним ответом:
+    их не больше, чем ингридиентов в рецептах из корзины.
+    """
+    if not request.user.is_authenticated:
+        return None
+    try:
+        renderer, _ = DefaultContentNegotiation().select_renderer(
+            request,
+            (
+                ShoppingListTxtRenderer(), ShoppingListCSVRenderer(),
+                ShoppingListJSONRenderer(),
+            ),
+        )
+    except APIException:
+        return None
+    rows = await sync_to_async(list)(
+        ShoppingListItem.objects.filter(user=request.user).values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).order_by('ingredient__name')
+    )
+    response = HttpResponse(
+        ''.join(renderer.stream(rows)),
+        content_type=f'{renderer.media_type}; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{renderer.format}"'
+    )
+    return response
@@ -0,0 +1,201 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+STATS_KEYS = ('auth_token_hits', 'auth_token_misses')
+
+# Раз в сколько секунд процесс записывает накопленную статистику в кэш.
+STATS_FLUSH_INTERVAL = 60
+
+
+def version_key(user_id):
+    return f'auth_user_version:{user_id}'
+
+
+class TokenCache:
+    """
+    Кэш token -> пользователь: LRU в памяти процесса
+    на AUTH_TOKEN_CACHE_SIZE записей, каждая живёт AUTH_TOKEN_CACHE_TTL
+    секунд. Запись действительна, пока не изменилась версия пользователя
+    в кэше Django, invalidate меняет её для всех процессов: кэш Django
+    общий (CACHES), LRU каждого процесса сверяется с ним не чаще раза
+    в CACHE_VERSION_CHECK_INTERVAL секунд на запись.
+    При AUTH_TOKEN_CACHE_SHARED записи хранятся и в кэше Django,
+    процессы получают их друг от друга без запроса к базе.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = [0, 0]
+        self._flushed_at = time.monotonic()
+
+    def _count(self, hit):
+        with self._lock:
+            self._stats[0 if hit else 1] += 1
+
+    def _flush_if_due(self):
+        with self._lock:
+            if time.monotonic() - self._flushed_at < STATS_FLUSH_INTERVAL:
+                return
+            stats, self._stats = self._stats, [0, 0]
+            self._flushed_at = time.monotonic()
+        self.flush_stats(stats)
+
+    def flush_stats(self, stats=None):
+        """Добавляет накопленные в процессе попадания и промахи в кэш."""
+        if stats is None:
+            with self._lock:
+                stats, self._stats = self._stats, [0, 0]
+                self._flushed_at = time.monotonic()
+        for key, value in zip(STATS_KEYS, stats):
+            if not value:
+                continue
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                cache.set(key, value, None)
+
+    def stats(self):
+        """Попадания, промахи и доля попаданий по всем процессам."""
+        self.flush_stats()
+        hits, misses = (cache.get(key, 0) for key in STATS_KEYS)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else None,
+        }
+
+    def _store_local(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def _recent(self, key):
+        """Токен из записи LRU, версия которой проверена недавно."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        token, _, expires, checked_at = entry
+        if (
+            expires > time.time()
+            and time.monotonic() - checked_at
+            < settings.CACHE_VERSION_CHECK_INTERVAL
+        ):
+            return token
+        return None
+
+    def _verify(self, key):
+        """Токен из LRU или общего кэша после сверки версии или None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None and settings.AUTH_TOKEN_CACHE_SHARED:
+            entry = cache.get(f'auth_token:{key}')
+        if entry is None:
+            return None
+        token, version, expires = entry[:3]
+        if expires > time.time() and version == cache.get(
+            version_key(token.user_id), 0
+        ):
+            self._store_local(key, (token, version, expires, time.monotonic()))
+            return token
+        with self._lock:
+            self._entries.pop(key, None)
+        return None
+
+    def peek(self, key):
+        """
+        Токен без обращения к кэшу Django, можно вызывать в цикле
+        событий. None, если записи нет в LRU или её версию пора
+        сверить: тогда нужен get.
+        """
+        token = self._recent(key)
+        if token is not None:
+            self._count(hit=True)
+        return token
+
+    def get(self, key):
+        """Токен с загруженным пользователем или None."""
+        token = self._recent(key) or self._verify(key)
+        self._count(hit=token is not None)
+        self._flush_if_due()
+        return token
+
+    def set(self, key, token):
+        ttl = settings.AUTH_TOKEN_CACHE_TTL
+        entry = (
+            token, cache.get(version_key(token.user_id), 0), time.time() + ttl
+        )
+        self._store_local(key, entry + (time.monotonic(),))
+        if settings.AUTH_TOKEN_CACHE_SHARED:
+            cache.set(f'auth_token:{key}', entry, ttl)
+
+    def invalidate(self, user_id):
+        """Делает недействительными все записи пользователя."""
+        try:
+            cache.incr(version_key(user_id))
+        except ValueError:
+            cache.set(version_key(user_id), 1, None)
+        with self._lock:
+            for key in [
+                key for key, entry in self._entries.items()
+                if entry[0].user_id == user_id
+            ]:
+                del self._entries[key]
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который берёт пользователя по токену
+    из token_cache и обращается к базе только при промахе.
+    """
+    def get_cached(self, key):
+        """(пользователь, токен) из token_cache или None, без базы."""
+        return self.credentials(token_cache.get(key))
+
+    def peek_cached(self, key):
+        """get_cached без обращения к кэшу Django (token_cache.peek)."""
+        return self.credentials(token_cache.peek(key))
+
+    def credentials(self, token):
+        if token is None:
+            return None
+        # Объект общий для потоков процесса, запросу отдаётся копия.
+        return copy.copy(token.user), token
+
+    def load(self, key):
+        """(пользователь, токен) из базы с сохранением в token_cache."""
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, token)
+        return copy.copy(token.user), token
+
+    def authenticate_credentials(self, key):
+        return self.get_cached(key) or self.load(key)
+
+
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """
+    Пользователь сохранён или удалён: роль, is_active, пароль
+    и профиль в кэше устарели. Обновление только last_login
+    при входе на них не влияет.
+    """
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    token_cache.invalidate(instance.id)
+
+
+def token_deleted(sender, instance, **kwargs):
+    """Токен удалён, например при выходе через djoser."""
+    token_cache.invalidate(instance.user_id)
@@ -0,0 +1,134 @@
+import json
+import threading
+
+from django.db import transaction
+
+from food.models import Recipe, RecipeDocument
+from foodgram.routers import PRIMARY
+from jobs.queue import enqueue
+
+PROFILE_FIELDS = frozenset(('email', 'username', 'first_name', 'last_name'))
+
+# id рецептов, документы которых собираются после фиксации транзакции.
+pending = threading.local()
+
+
+def render_document(recipe):
+    """Представление рецепта без данных пользователя в виде JSON."""
+    from api.serializers import RecipeDocumentSerializer
+
+    return json.loads(json.dumps(RecipeDocumentSerializer(recipe).data))
+
+
+def build_documents(recipe_ids):
+    """
+    Собирает и сохраняет документы рецептов recipe_ids.
+    Рецепты читаются с основной базы: документ, собранный по отставшей
+    реплике, остался бы в основной базе до следующей записи рецепта.
+    Возвращает словарь {id рецепта: документ}.
+    """
+    documents = {
+        recipe.id: RecipeDocument(recipe=recipe, data=render_document(recipe))
+        for recipe in Recipe.objects.using(PRIMARY).filter(
+            id__in=recipe_ids
+        ).with_related()
+    }
+    RecipeDocument.objects.bulk_create(
+        documents.values(), ignore_conflicts=True
+    )
+    return documents
+
+
+def rebuild_documents(recipe_ids):
+    """
+    Заменяет документы рецептов recipe_ids собранными заново.
+    Документ, который параллельный запрос собрал из прочитанных
+    до записи данных, удаляется вместе с остальными.
+    """
+    with transaction.atomic():
+        RecipeDocument.objects.filter(recipe_id__in=recipe_ids).delete()
+        build_documents(recipe_ids)
+
+
+def rebuild_pending():
+    recipe_ids = getattr(pending, 'ids', None)
+    if recipe_ids:
+        pending.ids = set()
+        rebuild_documents(sorted(recipe_ids))
+
+
+def invalidate_documents(recipe_ids):
+    """
+    Удаляет документы рецептов в текущей транзакции. Документ одного
+    рецепта собирается заново сразу после её фиксации, документы
+    нескольких (изменился автор) - фоновой задачей.
+    До пересборки документы собираются при чтении.
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids:
+        return
+    RecipeDocument.objects.filter(recipe_id__in=recipe_ids).delete()
+    if len(recipe_ids) == 1:
+        if not hasattr(pending, 'ids'):
+            pending.ids = set()
+        pending.ids.update(recipe_ids)
+        # Одна запись рецепта вызывает несколько сигналов,
+        # документ собирается первым обработчиком, остальные пропускаются.
+        transaction.on_commit(rebuild_pending)
+        return
+    enqueue('api.refresh_documents', recipe_ids, priority=-10)
+
+
+def attach_documents(recipes):
+    """
+    Подставляет рецептам недостающие документы,
+    собирая их одним пакетом.
+    """
+    missing = [
+        recipe for recipe in recipes
+        if getattr(recipe, 'document', None) is None
+    ]
+    if not missing:
+        return
+    documents = build_documents(recipe.id for recipe in missing)
+    for recipe in missing:
+        if recipe.id in documents:
+            recipe.document = documents[recipe.id]
+
+
+def recipe_changed(sender, instance, **kwargs):
+    """Рецепт сохранён."""
+    invalidate_documents((instance.id,))
+
+
+def relation_changed(sender, instance, **kwargs):
+    """Тег или ингридиент рецепта добавлен, изменён или удалён."""
+    invalidate_documents((instance.recipe_id,))
+
+
+def author_changed(sender, instance, created=False, update_fields=None,
+                   **kwargs):
+    """Изменились данные автора, которые есть в документах его рецептов."""
+    if created:
+        return
+    if update_fields is not None and not PROFILE_FIELDS & set(update_fields):
+        return
+    invalidate_documents(
+        Recipe.objects.filter(author=instance).values_list('id', flat=True)
+    )
+
+
+def tag_changed(sender, instance, **kwargs):
+    """
+    Изменился тег, документы рецептов с ним удаляются
+    и собираются заново при следующем чтении.
+    """
+    RecipeDocument.objects.filter(recipe__tags=instance).delete()
+
+
+def ingredient_changed(sender, instance, **kwargs):
+    """
+    Изменился ингридиент, документы рецептов с ним удаляются
+    и собираются заново при следующем чтении.
+    """
+    RecipeDocument.objects.filter(recipe__ingredients=instance).delete()
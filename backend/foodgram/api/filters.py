@@ -2,19 +2,31 @@ import django_filters
 
 from rest_framework import filters
 
-from food.models import Recipe, Tag
+from food.catalog import tag_registry
+from food.models import Recipe
+from food.search import search_recipes
 
 
-class IngredientSearchFilter(filters.SearchFilter):
-    search_param = "name"
+class RecipeOrderingFilter(filters.OrderingFilter):
+    """Сортировка рецептов, при поиске по умолчанию по релевантности."""
+    def get_default_ordering(self, view):
+        if view.request.query_params.get('search', '').strip():
+            return ('-search_rank',) + tuple(
+                super().get_default_ordering(view) or ()
+            )
+        return super().get_default_ordering(view)
+
+
+def tag_choices():
+    """Варианты слагов тегов из справочника, без запроса к базе."""
+    return [(slug, slug) for slug in tag_registry.slugs()]
 
 
 class RecipeFilter(django_filters.FilterSet):
     """Класс FilterSet для фильтрации рецепта."""
-    tags = django_filters.ModelMultipleChoiceFilter(
+    tags = django_filters.MultipleChoiceFilter(
         field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
+        choices=tag_choices,
     )
     is_favorited = django_filters.NumberFilter(
         method='filter_favorited', label='is_favorited'
@@ -23,6 +35,13 @@ class RecipeFilter(django_filters.FilterSet):
         method='filter_shopping_cart',
         label='is_in_shopping_cart',
     )
+    search = django_filters.CharFilter(
+        method='filter_search',
+        label='search',
+    )
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
 
     def filter_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated:
@@ -52,5 +71,5 @@ class RecipeFilter(django_filters.FilterSet):
         model = Recipe
         fields = (
             'tags', 'is_favorited',
-            'author', 'is_in_shopping_cart'
+            'author', 'is_in_shopping_cart', 'search'
         )
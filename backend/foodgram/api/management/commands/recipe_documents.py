@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.documents import build_documents, render_document
+from food.models import Recipe, RecipeDocument
+
+BATCH_SIZE = 500
+
+
+def recipe_ids():
+    return list(Recipe.objects.order_by('id').values_list('id', flat=True))
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересборки документов рецептов.
+    Запуск python manage.py recipe_documents [--check].
+    """
+    help = 'Пересобирает документы рецептов, с --check только сверяет их'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только найти отсутствующие и устаревшие документы',
+        )
+
+    def check_documents(self):
+        """Возвращает число отсутствующих и устаревших документов."""
+        missing = stale = 0
+        ids = recipe_ids()
+        for start in range(0, len(ids), BATCH_SIZE):
+            recipes = Recipe.objects.filter(
+                id__in=ids[start:start + BATCH_SIZE]
+            ).with_related().select_related('document').order_by('id')
+            for recipe in recipes:
+                document = getattr(recipe, 'document', None)
+                if document is None:
+                    missing += 1
+                    self.stdout.write(f'recipe={recipe.id}: нет документа')
+                elif document.data != render_document(recipe):
+                    stale += 1
+                    self.stdout.write(f'recipe={recipe.id}: документ устарел')
+        return missing, stale
+
+    def handle(self, *args, **kwargs):
+        if kwargs['check']:
+            missing, stale = self.check_documents()
+            if missing or stale:
+                raise CommandError(
+                    f'Нет документов: {missing}, устаревших: {stale}'
+                )
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        RecipeDocument.objects.all().delete()
+        ids = recipe_ids()
+        for start in range(0, len(ids), BATCH_SIZE):
+            build_documents(ids[start:start + BATCH_SIZE])
+        self.stdout.write(self.style.SUCCESS(
+            f'Документы рецептов пересобраны: {len(ids)}'
+        ))
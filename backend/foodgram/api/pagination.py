@@ -1,5 +1,367 @@
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+from functools import partial, reduce
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class CountedPaginator(Paginator):
+    """Paginator, число объектов которого считает counter(queryset)."""
+    def __init__(self, object_list, per_page, counter, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.counter = counter
+
+    @cached_property
+    def count(self):
+        return self.counter(self.object_list)
+
+
+class CountlessPage(Page):
+    """Страница, наличие следующей известно без подсчёта."""
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class CountlessPaginator(Paginator):
+    """
+    Paginator без COUNT(*): берёт на одну запись больше страницы,
+    чтобы узнать, есть ли следующая.
+    Число страниц неизвестно, num_pages = 1 только отключает
+    элементы управления страницами в browsable API.
+    """
+    count = None
+    num_pages = 1
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise InvalidPage('Номер страницы должен быть числом')
+        if number < 1:
+            raise InvalidPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not objects and number > 1:
+            raise InvalidPage('Страница пуста')
+        return CountlessPage(
+            objects[:self.per_page], number, self,
+            has_next=len(objects) > self.per_page,
+        )
+
+
+class ExactCount:
+    """Точный COUNT(*) по отфильтрованному запросу."""
+    def count(self, queryset, request):
+        return queryset.count()
+
+    def get_paginator_class(self, request):
+        return partial(
+            CountedPaginator, counter=partial(self.count, request=request)
+        )
+
+
+class CachedCount(ExactCount):
+    """
+    COUNT(*), закэшированный на ttl секунд по пути и параметрам запроса.
+    Параметры user_params зависят от пользователя, с ними в ключ
+    добавляется id пользователя. invalidate сбрасывает все счётчики.
+    Счётчики с реплики хранятся отдельно и не дольше
+    DATABASE_REPLICA_MAX_LAG: реплика могла ещё не получить запись,
+    после которой сброшены счётчики.
+    """
+    ignored_params = ('page', 'limit', 'cursor')
+
+    def __init__(self, version_key, ttl=None, user_params=()):
+        self.version_key = version_key
+        self.ttl = ttl
+        self.user_params = user_params
+
+    def invalidate(self, **kwargs):
+        """Помечает все закэшированные счётчики устаревшими."""
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 1, None)
+
+    def get_cache_key(self, request, database):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            if key not in self.ignored_params
+            for value in values
+        )
+        user_id = None
+        if any(key in self.user_params for key, value in params):
+            user_id = request.user.id
+        digest = hashlib.md5(
+            json.dumps([request.path, params, user_id, database]).encode()
+        ).hexdigest()
+        version = cache.get(self.version_key, 0)
+        return f'{self.version_key}:{version}:{digest}'
+
+    def count(self, queryset, request):
+        key = self.get_cache_key(request, queryset.db)
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            ttl = self.ttl
+            if ttl is None:
+                ttl = settings.PAGINATION_COUNT_TTL
+            if queryset.db in settings.DATABASE_REPLICAS:
+                ttl = min(ttl, settings.DATABASE_REPLICA_MAX_LAG)
+            cache.set(key, count, ttl)
+        return count
+
+
+class EstimatedCount(ExactCount):
+    """
+    Оценка числа строк планировщиком PostgreSQL (EXPLAIN),
+    если она больше threshold, иначе и на других базах точный COUNT(*).
+    """
+    def __init__(self, threshold=None):
+        self.threshold = threshold
+
+    def estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def count(self, queryset, request):
+        threshold = self.threshold
+        if threshold is None:
+            threshold = settings.PAGINATION_ESTIMATE_THRESHOLD
+        estimate = self.estimate(queryset)
+        if estimate is not None and estimate > threshold:
+            return estimate
+        return queryset.count()
+
+
+class EstimatedCountPaginator(CountedPaginator):
+    """Paginator с числом объектов из EstimatedCount, например для админки."""
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True):
+        super().__init__(
+            object_list, per_page,
+            counter=partial(EstimatedCount().count, request=None),
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+        )
+
+
+class HasNextOnly(ExactCount):
+    """Без подсчёта: count в ответе нет, есть только ссылка next."""
+    def get_paginator_class(self, request):
+        return CountlessPaginator
+
+
+recipe_counts = CachedCount('recipe_count_version', user_params=(
+    'is_favorited', 'is_in_shopping_cart'
+))
+
+
+class KeysetPagination:
+    """
+    Постраничный вывод по курсору: страница берётся условием
+    (поле1, поле2, ...) < значений последней записи, без OFFSET,
+    поэтому время выборки не зависит от глубины страницы,
+    а новые записи не сдвигают страницы.
+    Курсор непрозрачный: base64 от значений полей и направления.
+    """
+    invalid_cursor_message = 'Неверный курсор'
+
+    def __init__(self, ordering, cursor_query_param, page_size):
+        self.ordering = ordering
+        self.cursor_query_param = cursor_query_param
+        self.page_size = page_size
+
+    def encode_cursor(self, obj, reverse):
+        position = [getattr(obj, field) for field in self.ordering]
+        data = json.dumps({
+            'p': [
+                value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in position
+            ],
+            'r': reverse,
+        })
+        cursor = base64.urlsafe_b64encode(data.encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, model, cursor):
+        """Возвращает (значения полей или None, назад ли)."""
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.ordering, data['p'])
+            ]
+            reverse = bool(data['r'])
+        except (
+            TypeError, ValueError, KeyError, UnicodeDecodeError,
+            DjangoValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.ordering) or None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def beyond(self, position, reverse):
+        """Условие: запись дальше position в направлении обхода."""
+        lookup = 'gt' if reverse else 'lt'
+        conditions = []
+        for index, field in enumerate(self.ordering):
+            condition = {
+                prefix: value for prefix, value in zip(
+                    self.ordering[:index], position[:index]
+                )
+            }
+            condition[f'{field}__{lookup}'] = position[index]
+            conditions.append(Q(**condition))
+        return reduce(Q.__or__, conditions)
+
+    def paginate_queryset(self, queryset, request):
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self.decode_cursor(
+            queryset.model, request.query_params.get(self.cursor_query_param)
+        )
+        queryset = queryset.order_by(*(
+            field if reverse else f'-{field}' for field in self.ordering
+        ))
+        if position is not None:
+            queryset = queryset.filter(self.beyond(position, reverse))
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = has_more if reverse else position is not None
+        self.page = page
+        return page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
 
 
 class PageNumberAsLimitOffset(PageNumberPagination):
+    """
+    Постраничный вывод ?page=&limit=.
+    Число объектов считает count_strategy пагинатора
+    или одноимённый атрибут view.
+    Если задан cursor_ordering, с параметром ?cursor= (пустым для первой
+    страницы) включается вывод по курсору по убыванию этих полей.
+    Другой порядок (?ordering= или параметры cursor_conflicting_params,
+    например поиск по релевантности) вместе с курсором - ошибка 400.
+    """
     page_size_query_param = "limit"
+    cursor_query_param = 'cursor'
+    cursor_ordering = None
+    cursor_conflicting_params = ()
+    count_strategy = ExactCount()
+
+    def check_cursor_ordering(self, request):
+        ordering = [
+            field.strip() for field in request.query_params.get(
+                api_settings.ORDERING_PARAM, ''
+            ).split(',') if field.strip()
+        ]
+        keyset_ordering = [f'-{field}' for field in self.cursor_ordering]
+        if ordering != keyset_ordering[:len(ordering)] or any(
+            request.query_params.get(param, '').strip()
+            for param in self.cursor_conflicting_params
+        ):
+            raise ValidationError({
+                self.cursor_query_param: (
+                    'Курсор выводит по убыванию '
+                    f'{", ".join(self.cursor_ordering)}, другой порядок '
+                    'с ним не задаётся'
+                )
+            })
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (
+            self.cursor_ordering
+            and self.cursor_query_param in request.query_params
+        ):
+            self.check_cursor_ordering(request)
+            self.request = request
+            self.keyset = KeysetPagination(
+                self.cursor_ordering,
+                self.cursor_query_param,
+                self.get_page_size(request),
+            )
+            return self.keyset.paginate_queryset(queryset, request)
+        count_strategy = getattr(view, 'count_strategy', self.count_strategy)
+        self.django_paginator_class = count_strategy.get_paginator_class(
+            request
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        response = OrderedDict()
+        if self.page.paginator.count is not None:
+            response['count'] = self.page.paginator.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+
+class RecipePagination(PageNumberAsLimitOffset):
+    """Рецепты: курсор по (pub_date, id), число из кэша."""
+    cursor_ordering = ('pub_date', 'id')
+    cursor_conflicting_params = ('search',)
+    count_strategy = recipe_counts
+
+
+class SubscriptionPagination(PageNumberAsLimitOffset):
+    """Подписки: курсор по id подписки."""
+    cursor_ordering = ('id',)
@@ -13,3 +13,9 @@ class IsReadOnly(BasePermission):
             request.method in SAFE_METHODS or obj.author == request.user
             or request.user.is_admin
         )
+
+
+class IsAdmin(BasePermission):
+    """Доступ только администратору."""
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.is_admin
@@ -0,0 +1,53 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+    def write(self, value):
+        return value
+
+
+class ShoppingListTxtRenderer(BaseRenderer):
+    """Рендерер списка покупок в текстовом формате."""
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return str(data).encode(self.charset)
+
+    def stream(self, rows):
+        for row in rows:
+            yield (
+                f'{row["name"]} ({row["measurement_unit"]}) '
+                f'- {row["amount"]}\n'
+            )
+
+
+class ShoppingListCSVRenderer(ShoppingListTxtRenderer):
+    """Рендерер списка покупок в формате csv."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for row in rows:
+            yield writer.writerow(
+                (row['name'], row['measurement_unit'], row['amount'])
+            )
+
+
+class ShoppingListJSONRenderer(JSONRenderer):
+    """Рендерер списка покупок в формате json."""
+    def stream(self, rows):
+        separator = '['
+        for row in rows:
+            yield separator + json.dumps(row, ensure_ascii=False)
+            separator = ','
+        yield ']' if separator == ',' else '[]'
@@ -1,19 +1,53 @@
 import base64
+from collections import OrderedDict
+
 import webcolors
 
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.files.base import ContentFile
 from django.core.validators import RegexValidator
-from django.db.models import Sum
+from django.db import models, transaction
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from rest_framework.relations import StringRelatedField
 from rest_framework.validators import UniqueValidator
 
+from api.documents import (attach_documents, build_documents,
+                           invalidate_documents)
+from api.pagination import recipe_counts
+from food.catalog import ingredient_catalog, tag_registry
 from food.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                         ShoppingCart, Tag, TagRecipe)
+                         ShoppingCart, ShoppingListItem, Tag, TagRecipe)
+from jobs.models import Job
 from users.models import Subscription, User
 
 
+def load_subscriptions(request, user_ids):
+    """
+    Возвращает словарь {id автора: подписан ли текущий пользователь}.
+    Загружается одним запросом только для недостающих user_ids
+    и хранится в request, общий для всех сериализаторов запроса.
+    """
+    subscriptions = getattr(request, '_subscriptions', None)
+    if subscriptions is None:
+        subscriptions = request._subscriptions = {}
+    missing = set(user_ids) - subscriptions.keys()
+    if not missing:
+        return subscriptions
+    if not request.user.is_authenticated:
+        subscriptions.update(dict.fromkeys(missing, False))
+        return subscriptions
+    subscribed = set(
+        Subscription.objects.filter(
+            user=request.user, subscriber_id__in=missing
+        ).values_list('subscriber_id', flat=True)
+    )
+    for user_id in missing:
+        subscriptions[user_id] = user_id in subscribed
+    return subscriptions
+
+
 class Base64ImageField(serializers.ImageField):
     """Класс раскодировки изображения."""
     def to_internal_value(self, data):
@@ -37,6 +71,103 @@ class Hex2NameColor(serializers.Field):
         return data
 
 
+class UserListSerializer(serializers.ListSerializer):
+    """Список пользователей с одной загрузкой подписок на страницу."""
+    def to_representation(self, data):
+        users = data.all() if isinstance(data, models.Manager) else data
+        request = self.context.get('request')
+        if request is not None:
+            load_subscriptions(request, (user.id for user in users))
+        return super().to_representation(users)
+
+
+def to_int(value):
+    """
+    Целое число из value по правилам IntegerField: 5.7 и True
+    не обрезаются до 5 и 1, а вызывают ValidationError.
+    """
+    return serializers.IntegerField().to_internal_value(value)
+
+
+class RecipeTagsField(serializers.Field):
+    """Поле тегов рецепта, id проверяются по справочнику тегов в памяти."""
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            raise serializers.ValidationError('Проверьте tags, нет id')
+        try:
+            ids = [to_int(tag_id) for tag_id in data]
+        except serializers.ValidationError:
+            raise serializers.ValidationError(
+                'Проверьте tags, id должны быть числами'
+            )
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError('Проверьте tags, есть повторы')
+        tags = tag_registry.in_bulk(ids)
+        missing = [str(tag_id) for tag_id in ids if tag_id not in tags]
+        if missing:
+            raise serializers.ValidationError(
+                f'Проверьте tags, нет таких id: {", ".join(missing)}'
+            )
+        return [tags[tag_id] for tag_id in ids]
+
+    def to_representation(self, value):
+        return TagSerializer(value.all(), many=True).data
+
+
+class RecipeIngredientsField(serializers.Field):
+    """
+    Поле ингридиентов рецепта [{id, amount}].
+    Элементы проверяются без вложенных сериализаторов,
+    id по справочнику ингридиентов в памяти.
+    """
+    def get_attribute(self, instance):
+        return instance.recipe.all()
+
+    def parse_item(self, item):
+        """Возвращает (id, amount) элемента или список ошибок."""
+        try:
+            ingredient_id = to_int(item['id'])
+            amount = to_int(item['amount'])
+        except (KeyError, TypeError, serializers.ValidationError):
+            return ['Проверьте ingredients, нужны числа id и amount']
+        try:
+            IngredientRecipe._meta.get_field('amount').run_validators(amount)
+        except DjangoValidationError as error:
+            return error.messages
+        return ingredient_id, amount
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            raise serializers.ValidationError('Проверьте ingredients, их нет')
+        errors = {}
+        amounts = {}
+        indexes = {}
+        for index, item in enumerate(data):
+            parsed = self.parse_item(item)
+            if not isinstance(parsed, tuple):
+                errors[index] = parsed
+            elif parsed[0] in amounts:
+                errors[index] = ['Проверьте ingredients, есть повторы']
+            else:
+                amounts[parsed[0]] = parsed[1]
+                indexes[parsed[0]] = index
+        ingredients = ingredient_catalog.in_bulk(amounts)
+        for ingredient_id, index in indexes.items():
+            if ingredient_id not in ingredients:
+                errors[index] = [
+                    f'Проверьте ingredients, нет такого id: {ingredient_id}'
+                ]
+        if errors:
+            raise serializers.ValidationError(dict(sorted(errors.items())))
+        return [
+            {'ingredient': ingredients[ingredient_id], 'amount': amount}
+            for ingredient_id, amount in amounts.items()
+        ]
+
+    def to_representation(self, value):
+        return IngredientRecipeSerializer(value, many=True).data
+
+
 class MyUserSerializer(serializers.ModelSerializer):
     """Сериализатор для пользователей."""
     username = serializers.CharField(
@@ -47,6 +178,12 @@ class MyUserSerializer(serializers.ModelSerializer):
             UniqueValidator(queryset=User.objects.all()),
         )
     )
+    email = serializers.EmailField(
+        max_length=254,
+        validators=(
+            UniqueValidator(queryset=User.objects.all(), lookup='iexact'),
+        )
+    )
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -54,8 +191,11 @@ class MyUserSerializer(serializers.ModelSerializer):
         model = User
         fields = (
             'email', 'id', 'username', 'is_subscribed',
-            'first_name', 'last_name', 'password'
+            'first_name', 'last_name', 'password',
+            'recipes_count', 'followers_count',
         )
+        read_only_fields = ('recipes_count', 'followers_count')
+        list_serializer_class = UserListSerializer
 
     def to_representation(self, instance):
         response = super(MyUserSerializer, self).to_representation(instance)
@@ -64,10 +204,9 @@ class MyUserSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        user_id = request.user.id
-        return Subscription.objects.filter(
-            user_id=user_id, subscriber_id=obj.id
-        ).exists()
+        if request is None:
+            return False
+        return load_subscriptions(request, (obj.id,))[obj.id]
 
 
 class MeSerializer(serializers.ModelSerializer):
@@ -127,6 +266,55 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class RecipeDocumentSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор документа рецепта: всё, что не зависит от пользователя.
+    Ссылка на изображение относительная.
+    """
+    tags = TagSerializer(many=True)
+    author = MeSerializer()
+    ingredients = IngredientRecipeSerializer(source='recipe', many=True)
+    image = serializers.ImageField()
+    image_renditions = serializers.SerializerMethodField()
+
+    class Meta:
+        """Класс мета для модели рецепта."""
+        model = Recipe
+        fields = ('id', 'tags', 'author', 'ingredients',
+                  'name', 'image', 'image_renditions',
+                  'text', 'cooking_time'
+                  )
+
+    def get_image_renditions(self, obj):
+        """Уменьшенные копии картинки по возрастанию ширины."""
+        storage = obj.image.storage
+        return [
+            OrderedDict((
+                ('width', item['width']),
+                ('image', storage.url(item['image'])),
+                ('webp', storage.url(item['webp'])),
+            ))
+            for item in (obj.image_renditions or {}).get('items', ())
+        ]
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """
+    Список рецептов с одной загрузкой подписок на авторов
+    и одной сборкой недостающих документов.
+    """
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, models.Manager) else data
+        recipes = list(recipes)
+        attach_documents(recipes)
+        request = self.context.get('request')
+        if request is not None:
+            load_subscriptions(
+                request, (recipe.author_id for recipe in recipes)
+            )
+        return super().to_representation(recipes)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для получения рецепта."""
     tags = TagSerializer(many=True)
@@ -141,35 +329,81 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image',
-                  'text', 'cooking_time'
+                  'name', 'image', 'image_renditions',
+                  'text', 'cooking_time',
+                  'favorites_count', 'in_carts_count'
                   )
+        read_only_fields = (
+            'image_renditions', 'favorites_count', 'in_carts_count'
+        )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        """
+        Документ рецепта из RecipeDocument
+        с подставленными данными текущего пользователя и счётчиками.
+        """
+        document = getattr(instance, 'document', None)
+        if document is None:
+            document = build_documents((instance.id,))[instance.id]
+        data = document.data
+        request = self.context.get('request')
+        author = data['author']
+        is_subscribed = False
+        if request is not None:
+            is_subscribed = load_subscriptions(
+                request, (author['id'],)
+            )[author['id']]
+        image = data['image']
+        renditions = data.get('image_renditions', [])
+        if request is not None:
+            if image:
+                image = request.build_absolute_uri(image)
+            renditions = [
+                OrderedDict((
+                    ('width', item['width']),
+                    ('image', request.build_absolute_uri(item['image'])),
+                    ('webp', request.build_absolute_uri(item['webp'])),
+                ))
+                for item in renditions
+            ]
+        return OrderedDict((
+            ('id', data['id']),
+            ('tags', data['tags']),
+            ('author', OrderedDict((
+                ('email', author['email']),
+                ('id', author['id']),
+                ('username', author['username']),
+                ('is_subscribed', is_subscribed),
+                ('first_name', author['first_name']),
+                ('last_name', author['last_name']),
+            ))),
+            ('ingredients', data['ingredients']),
+            ('is_favorited', self.get_is_favorited(instance)),
+            ('is_in_shopping_cart', self.get_is_in_shopping_cart(instance)),
+            ('name', data['name']),
+            ('image', image),
+            ('image_renditions', renditions),
+            ('text', data['text']),
+            ('cooking_time', data['cooking_time']),
+            ('favorites_count', instance.favorites_count),
+            ('in_carts_count', instance.in_carts_count),
+        ))
 
     def get_is_favorited(self, obj):
-        request = self.context['request']
-        user_id = request.user.id
-        return Favorite.objects.filter(
-            user_id=user_id, recipe_id=obj.id
-        ).exists()
+        """Значение из Recipe.objects.with_user_flags."""
+        return getattr(obj, 'is_favorited', False)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context['request']
-        user_id = request.user.id
-        return ShoppingCart.objects.filter(
-            user_id=user_id, recipe_id=obj.id
-        ).exists()
+        """Значение из Recipe.objects.with_user_flags."""
+        return getattr(obj, 'is_in_shopping_cart', False)
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и изменения рецепта."""
     author = MyUserSerializer(read_only=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
-    )
-    ingredients = IngredientRecipeSerializer(
-        many=True
-    )
+    tags = RecipeTagsField()
+    ingredients = RecipeIngredientsField()
     image = Base64ImageField(required=False, allow_null=True)
 
     class Meta:
@@ -181,109 +415,138 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                   'text', 'cooking_time'
                   )
 
-    def data_validate(self, data):
-        if not isinstance(data.get('cooking_time'), int):
-            raise serializers.ValidationError({
-                'cooking_time': 'Проверьте cooking_time, должно быть числом'
-            })
-        if not data.get('tags'):
-            raise serializers.ValidationError({
-                'tags': 'Проверьте tags, нет id'
-            })
-        tags = set()
-        tags = [
-            tag for tag in data.get('tags')
-            if tag in tags or (tags.add(tag) or False)
-        ]
-        if tags:
-            raise serializers.ValidationError({
-                'tags': 'Проверьте tags, есть поавторы'
-            })
-        if not data.get('ingredients'):
-            raise serializers.ValidationError({
-                'ingredients': 'Проверьте ingredients, их нет'
-            })
-        ingredients = set()
-        for ingredient in data.get('ingredients'):
-            id = ingredient.get('ingredient').get('id')
-            if id not in ingredients:
-                ingredients.add(id)
-                if not Ingredient.objects.filter(pk=id).exists():
-                    raise serializers.ValidationError(
-                        {'ingredients': 'Проверьте ingredients, нет такого id'}
-                    )
-            else:
-                raise serializers.ValidationError(
-                    {'ingredients': 'Проверьте ingredients, есть повторы'}
-                )
-        return data
-
+    @transaction.atomic
     def create(self, validated_data):
-        validated_data = self.data_validate(validated_data)
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
-        for tag in tags:
-            TagRecipe.objects.create(
-                tag=tag,
-                recipe=recipe,
-            )
-        for ingredient in ingredients:
-            ingredient_id = ingredient.get('ingredient').get('id')
-            current_ingredient = get_object_or_404(
-                Ingredient,
-                pk=ingredient_id
-            )
-            IngredientRecipe.objects.create(
-                ingredient=current_ingredient,
+        TagRecipe.objects.bulk_create(
+            TagRecipe(tag=tag, recipe=recipe) for tag in tags
+        )
+        ingredient_recipes = [
+            IngredientRecipe(
+                ingredient=ingredient.get('ingredient'),
                 recipe=recipe,
                 amount=ingredient.get('amount'))
+            for ingredient in ingredients
+        ]
+        IngredientRecipe.objects.bulk_create(ingredient_recipes)
+        recipe._prefetched_objects_cache = {
+            'tags': sorted(tags, key=lambda tag: tag.id),
+            'recipe': ingredient_recipes,
+        }
         return recipe
 
-    def update(self, instance, validated_data):
-        validated_data = self.data_validate(validated_data)
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        Recipe.objects.filter(id=instance.id).update(**validated_data)
-        for tag in instance.tags.all():
-            if tag in tags:
-                tags.remove(tag)
-                continue
-            TagRecipe.objects.filter(recipe=instance, tag=tag).delete()
-        for tag in tags:
-            TagRecipe.objects.create(
-                tag=tag,
-                recipe=instance,
+    def update_tags(self, instance, tags):
+        """Удаляет и добавляет только изменившиеся теги рецепта."""
+        current = set(
+            TagRecipe.objects.filter(
+                recipe=instance
+            ).values_list('tag_id', flat=True)
+        )
+        submitted = {tag.id for tag in tags}
+        if current - submitted:
+            TagRecipe.objects.filter(
+                recipe=instance, tag_id__in=current - submitted
+            ).delete()
+        TagRecipe.objects.bulk_create(
+            TagRecipe(tag=tag, recipe=instance)
+            for tag in tags if tag.id not in current
+        )
+        recipe_counts.invalidate()
+
+    def update_ingredients(self, instance, ingredients):
+        """
+        Удаляет, меняет и добавляет только изменившиеся ингридиенты.
+        Возвращает старые и новые количества {id ингридиента: количество}
+        оставшихся ингридиентов: удалённые вычитает из списков покупок
+        сигнал post_delete, bulk_update и bulk_create сигналов не отправляют.
+        """
+        current = {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in IngredientRecipe.objects.filter(
+                recipe=instance
             )
-        for ingredient in instance.ingredients.all():
+        }
+        old_amounts = {
+            ingredient_id: ingredient_recipe.amount
+            for ingredient_id, ingredient_recipe in current.items()
+        }
+        submitted = {
+            ingredient.get('ingredient').id: ingredient.get('amount')
+            for ingredient in ingredients
+        }
+        stale = current.keys() - submitted.keys()
+        for ingredient_id in stale:
+            del old_amounts[ingredient_id]
+        if stale:
             IngredientRecipe.objects.filter(
-                recipe=instance,
-                ingredient=ingredient
+                recipe=instance, ingredient_id__in=stale
             ).delete()
-        for ingredient in ingredients:
-            ingredient_id = ingredient.get('ingredient').get('id')
-            current_ingredient = get_object_or_404(
-                Ingredient, pk=ingredient_id
-            )
-            IngredientRecipe.objects.create(
-                ingredient=current_ingredient,
+        changed = []
+        for ingredient_id, amount in submitted.items():
+            ingredient_recipe = current.get(ingredient_id)
+            if ingredient_recipe is not None and (
+                ingredient_recipe.amount != amount
+            ):
+                ingredient_recipe.amount = amount
+                changed.append(ingredient_recipe)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ('amount',))
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                ingredient_id=ingredient_id,
                 recipe=instance,
-                amount=ingredient.get('amount'))
-        instance = Recipe.objects.filter(id=instance.id).get()
+                amount=amount,
+            )
+            for ingredient_id, amount in submitted.items()
+            if ingredient_id not in current
+        )
+        return old_amounts, submitted
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        # Параллельные изменения рецепта ждут друг друга, иначе обе
+        # посчитают разницу от одних старых количеств в списках покупок.
+        list(
+            Recipe.objects.select_for_update().filter(
+                pk=instance.pk
+            ).values_list('pk', flat=True)
+        )
+        if validated_data:
+            for field, value in validated_data.items():
+                setattr(instance, field, value)
+            instance.save(update_fields=validated_data.keys())
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if ingredients is not None:
+            old_amounts, new_amounts = self.update_ingredients(
+                instance, ingredients
+            )
+            ShoppingListItem.objects.change_recipe(
+                instance, old_amounts, new_amounts
+            )
+        # bulk_create, bulk_update и update не отправляют сигналы.
+        invalidate_documents((instance.id,))
+        instance = Recipe.objects.with_related().get(id=instance.id)
         return instance
 
-    def to_representation(self, instance):
-        self.fields.pop('ingredients')
-        representation = super().to_representation(instance)
-        representation['tags'] = TagSerializer(
-            Tag.objects.filter(id__in=instance.tags.all()),
-            many=True
-        ).data
-        representation['ingredients'] = IngredientRecipeSerializer(
-            IngredientRecipe.objects.filter(recipe=instance),
-            many=True
-        ).data
-        return representation
+
+class SubscriptionListSerializer(serializers.ListSerializer):
+    """Список подписок с одной загрузкой подписок на авторов."""
+    def to_representation(self, data):
+        subscriptions = (
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        request = self.context.get('request')
+        if request is not None:
+            load_subscriptions(
+                request,
+                (subscription.subscriber_id for subscription in subscriptions)
+            )
+        return super().to_representation(subscriptions)
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -304,28 +567,31 @@ class SubscriptionSerializer(serializers.ModelSerializer):
                   'is_subscribed', 'first_name', 'last_name',
                   'recipes', 'recipes_count'
                   )
+        list_serializer_class = SubscriptionListSerializer
 
     def get_is_subscribed(self, obj):
-        return Subscription.objects.filter(
-            user_id=obj.user.id, subscriber_id=obj.subscriber.id
-        ).exists()
+        """Подписка obj существует, значит пользователь подписан."""
+        return True
 
     def get_recipes(self, obj):
-        recipes_limit = self.context.get('recipes_limit', None)
-        if recipes_limit is not None:
-            queryset = Recipe.objects.filter(
-                author=obj.subscriber
-            )[:recipes_limit]
-        else:
-            queryset = Recipe.objects.filter(author=obj.subscriber)
+        recipes_limit = self.context.get('recipes_limit')
+        if recipes_limit is None:
+            recipes_limit = settings.RECIPES_LIMIT
+        queryset = getattr(obj.subscriber, 'prefetched_recipes', None)
+        if queryset is None:
+            queryset = Recipe.objects.latest_per_author(
+                recipes_limit
+            ).with_user_flags(
+                self.context.get('request').user
+            ).select_related('document').filter(author=obj.subscriber)
         return RecipeSerializer(
-            queryset,
+            queryset[:recipes_limit],
             many=True,
             context={'request': self.context.get('request')}
         ).data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.subscriber).count()
+        return obj.subscriber.recipes_count
 
     def validate(self, data):
         """Проверка на повтор."""
@@ -348,10 +614,10 @@ class SubscriptionSerializer(serializers.ModelSerializer):
 
 class FavoriteSerializer(serializers.ModelSerializer):
     """Сериализатор для избранного."""
-    id = serializers.IntegerField(source='favorites.id', read_only=True)
-    name = StringRelatedField(source='favorites.name', read_only=True)
+    id = serializers.IntegerField(source='recipe.id', read_only=True)
+    name = StringRelatedField(source='recipe.name', read_only=True)
     cooking_time = serializers.IntegerField(
-        source='favorites.cooking_time',
+        source='recipe.cooking_time',
         read_only=True
     )
 
@@ -398,23 +664,10 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         return data
 
 
-class GetShoppingCartSerializer(serializers.ModelSerializer):
-    """Сериализатор для получения списка покупок."""
-    class Meta:
-        model = ShoppingCart
+class JobSerializer(serializers.ModelSerializer):
+    """Сериализатор статуса фоновой задачи."""
 
-    def to_representation(self, instance):
-        response = {}
-        shop_list = ''
-        query = IngredientRecipe.objects.filter(
-            recipe__in=instance.values('recipe')
-        ).values('ingredient').annotate(score=Sum('amount'))
-        for item in query:
-            name = Ingredient.objects.get(id=item.get('ingredient')).name
-            measurement_unit = Ingredient.objects.get(
-                id=item.get('ingredient')).measurement_unit
-            sum = item.get('score')
-            str = f'{name} {measurement_unit} - {sum} \n'
-            shop_list += str
-        response['shop_list'] = shop_list
-        return response
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'status', 'attempts', 'created',
+                  'finished', 'result')
@@ -0,0 +1,7 @@
+from api.documents import rebuild_documents
+from jobs.queue import task
+
+
+@task('api.refresh_documents')
+def refresh(recipe_ids):
+    rebuild_documents(recipe_ids)
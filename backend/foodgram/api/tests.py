@@ -0,0 +1,368 @@
+import base64
+import json
+
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.test import (AsyncClient, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from food.catalog import ingredient_catalog, tag_registry
+from food.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                         RecipeDocument, ShoppingCart, ShoppingListItem, Tag,
+                         TagRecipe)
+from foodgram.middleware import ReplicaMiddleware
+from foodgram.routers import read_database, replicas
+from jobs.queue import registry
+from users.models import Subscription, User
+
+
+class QueryCountTest(TestCase):
+    """Число запросов страницы не зависит от числа объектов на ней."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email='reader@example.com', username='reader'
+        )
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', color=color,
+                               slug=f'tag{number}')
+            for number, color in enumerate(('#E26C2D', '#49B64E'))
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингридиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+        for number in range(4):
+            author = User.objects.create(
+                email=f'author{number}@example.com',
+                username=f'author{number}',
+            )
+            Subscription.objects.create(user=cls.user, subscriber=author)
+            for index in range(2):
+                recipe = Recipe.objects.create(
+                    author=author,
+                    name=f'Рецепт {number}-{index}',
+                    text='Описание',
+                    cooking_time=10,
+                )
+                for tag in tags:
+                    TagRecipe.objects.create(tag=tag, recipe=recipe)
+                for ingredient in ingredients:
+                    IngredientRecipe.objects.create(
+                        ingredient=ingredient, recipe=recipe, amount=5
+                    )
+                if index:
+                    Favorite.objects.create(user=cls.user, recipe=recipe)
+                    ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url, size):
+        """Число запросов к базе на url с кэшем, очищенным перед запросом."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), size)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url, small, large):
+        # Первый запрос собирает документы рецептов.
+        self.client.get(f'{url}?limit={large}')
+        self.assertEqual(
+            self.count_queries(f'{url}?limit={small}', small),
+            self.count_queries(f'{url}?limit={large}', large),
+        )
+
+    def test_recipe_list(self):
+        self.assertConstantQueries('/api/recipes/', 2, 8)
+
+    def test_recipe_list_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assertConstantQueries('/api/recipes/', 2, 8)
+
+    def test_recipe_list_without_documents(self):
+        small = self.count_queries('/api/recipes/?limit=2', 2)
+        RecipeDocument.objects.all().delete()
+        self.assertEqual(
+            small, self.count_queries('/api/recipes/?limit=8', 8)
+        )
+
+    def test_subscriptions(self):
+        self.assertConstantQueries('/api/users/subscriptions/', 1, 4)
+
+
+class TokenCacheTest(TestCase):
+    """Повторный запрос с тем же токеном не обращается к базе и кэшу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email='reader@example.com', username='reader'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.flush_stats()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_me(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['email'], 'reader@example.com')
+
+    def test_logout(self):
+        self.client.get('/api/users/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+
+class RecipeDocumentTest(TestCase):
+    """Документ рецепта пересобирается после изменения рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            email='author@example.com', username='author'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Борщ', text='Описание', cooking_time=60
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def test_edit(self):
+        self.assertEqual(self.client.get(self.url).data['name'], 'Борщ')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, {'name': 'Щи'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url).data['name'], 'Щи')
+        self.assertEqual(
+            self.client.get('/api/recipes/').data['results'][0]['name'], 'Щи'
+        )
+
+    def test_stale_document_replaced(self):
+        stale = self.client.get(self.url).data
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'name': 'Щи'})
+            # Параллельный запрос прочитал рецепт до записи
+            # и сохранил документ после того, как запись его удалила.
+            RecipeDocument.objects.create(recipe=self.recipe, data=stale)
+        self.assertEqual(self.client.get(self.url).data['name'], 'Щи')
+
+    def test_refresh_job_replaces_document(self):
+        stale = self.client.get(self.url).data
+        Recipe.objects.filter(id=self.recipe.id).update(name='Щи')
+        RecipeDocument.objects.filter(recipe=self.recipe).update(data=stale)
+        registry['api.refresh_documents']([self.recipe.id])
+        self.assertEqual(self.client.get(self.url).data['name'], 'Щи')
+
+
+class CursorPaginationTest(TestCase):
+    """Постраничный вывод рецептов по курсору."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            email='author@example.com', username='author'
+        )
+        cls.names = [f'Рецепт {number}' for number in range(5)]
+        for name in cls.names:
+            Recipe.objects.create(
+                author=author, name=name, text='Описание', cooking_time=10
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_pages(self):
+        names = []
+        url = '/api/recipes/?cursor=&limit=2'
+        while url:
+            response = self.client.get(url)
+            names += [recipe['name'] for recipe in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(names, self.names[::-1])
+
+    def test_invalid_cursor(self):
+        for position in (['2023-01-01T00:00:00+00:00', 'x'], ['x', 1]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({'p': position, 'r': False}).encode()
+            ).decode()
+            response = self.client.get(f'/api/recipes/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404)
+
+    def test_other_ordering(self):
+        for query in ('ordering=-pub_date', 'ordering=-pub_date,-id'):
+            response = self.client.get(f'/api/recipes/?cursor=&{query}')
+            self.assertEqual(response.status_code, 200, query)
+        for query in (
+            'ordering=favorites_count', 'ordering=pub_date', 'search=рецепт'
+        ):
+            response = self.client.get(f'/api/recipes/?cursor=&{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+
+@override_settings(ROOT_URLCONF='foodgram.urls_asgi')
+class AsyncRecipeListTest(TestCase):
+    """Асинхронный список рецептов отвечает на ошибки как DRF."""
+
+    async def test_invalid_filters(self):
+        client = AsyncClient()
+        for query in ('tags=nonexistent', 'is_favorited=abc'):
+            response = await client.get(f'/api/recipes/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+
+@override_settings(ROOT_URLCONF='foodgram.urls_asgi')
+class AsyncAuthenticatedTest(TransactionTestCase):
+    """
+    Асинхронные view с токеном и справочниками: кэш Django в базе
+    читается только в потоках, не в цикле событий.
+    """
+
+    def setUp(self):
+        cache.clear()
+        ingredient_catalog.invalidate()
+        tag_registry.invalidate()
+        user = User.objects.create(
+            email='reader@example.com', username='reader'
+        )
+        self.token = Token.objects.create(user=user)
+        tag = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        recipe = Recipe.objects.create(
+            author=user, name='Суп', text='Описание', cooking_time=30
+        )
+        TagRecipe.objects.create(tag=tag, recipe=recipe)
+        self.urls = (
+            '/api/recipes/', f'/api/recipes/{recipe.id}/',
+            '/api/ingredients/', f'/api/ingredients/{ingredient.id}/',
+            '/api/tags/', f'/api/tags/{tag.id}/',
+        )
+
+    async def assertResponses(self):
+        client = AsyncClient(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Второй запрос берёт пользователя и справочники из памяти.
+        for _ in range(2):
+            for url in self.urls:
+                response = await client.get(url)
+                self.assertEqual(response.status_code, 200, url)
+
+    async def test_views(self):
+        for interval in (1, 0):
+            with override_settings(CACHE_VERSION_CHECK_INTERVAL=interval):
+                await self.assertResponses()
+
+    async def test_replica(self):
+        # Реплику изображает сама основная база.
+        self.addCleanup(replicas._checked.pop, 'default', None)
+        with override_settings(DATABASE_REPLICAS=['default']):
+            await self.assertResponses()
+
+
+class RecipeUpdateTest(TestCase):
+    """Изменение тегов и ингридиентов рецепта через API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            email='author@example.com', username='author'
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        cls.salt, cls.sugar, cls.flour = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Соль', 'Сахар', 'Мука')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Пирог', text='Описание', cooking_time=60
+        )
+        for ingredient in (cls.salt, cls.sugar):
+            IngredientRecipe.objects.create(
+                recipe=cls.recipe, ingredient=ingredient, amount=5
+            )
+        ShoppingCart.objects.create(user=cls.author, recipe=cls.recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_update(self):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': self.salt.id, 'amount': 8},
+                    {'id': self.flour.id, 'amount': 2},
+                ],
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ShoppingListItem.objects.drift(), {})
+        self.assertEqual(
+            dict(ShoppingListItem.objects.values_list(
+                'ingredient_id', 'amount'
+            )),
+            {self.salt.id: 8, self.flour.id: 2},
+        )
+
+    def test_non_integer_values(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        for data in (
+            {'ingredients': [{'id': self.salt.id, 'amount': 5.7}]},
+            {'ingredients': [{'id': self.salt.id, 'amount': True}]},
+            {'tags': [1.5]},
+        ):
+            response = self.client.patch(url, data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+        self.assertEqual(
+            IngredientRecipe.objects.get(
+                recipe=self.recipe, ingredient=self.salt
+            ).amount,
+            5,
+        )
+
+
+class ReplicaMiddlewareTest(TestCase):
+    """Чтение, на котором отказала реплика, повторяется на основной базе."""
+
+    def test_retry_on_primary(self):
+        request = RequestFactory().get('/api/tags/')
+        request.resolver_match = resolve('/api/tags/')
+        middleware = ReplicaMiddleware(lambda request: HttpResponse())
+        # Реплику изображает сама основная база.
+        self.addCleanup(replicas._checked.pop, 'default', None)
+        context = read_database.set('default')
+        try:
+            response = middleware.process_exception(request, DatabaseError())
+            self.assertIsNone(read_database.get())
+        finally:
+            read_database.reset(context)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(replicas.is_healthy('default'))
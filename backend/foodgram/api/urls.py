@@ -2,9 +2,9 @@ from django.urls import include, path
 from rest_framework import routers
 
 from api.views import (FavoriteViewSet, GetSubscription, IngredientViewSet,
-                       RecipeViewSet, ShoppingCartViewSet, SubscribeViewSet,
-                       TagViewSet, UserViewSet, get_me, get_ShoppingCart,
-                       set_password)
+                       JobViewSet, RecipeViewSet, ShoppingCartViewSet,
+                       SubscribeViewSet, TagViewSet, UserViewSet, get_me,
+                       get_ShoppingCart, set_password, token_cache_stats)
 
 app_name = 'api'
 
@@ -52,6 +52,12 @@ router_v1.register(
     basename='recipes'
 )
 
+router_v1.register(
+    'jobs',
+    JobViewSet,
+    basename='jobs'
+)
+
 
 urlpatterns = [
     path(
@@ -64,6 +70,11 @@ urlpatterns = [
         GetSubscription.as_view(),
         name='subscriptions'
     ),
+    path(
+        'auth/token_cache/',
+        token_cache_stats,
+        name='token_cache_stats'
+    ),
     path('auth/', include('djoser.urls.authtoken')),
     path('users/me/', get_me, name='me'),
     path('users/set_password/', set_password, name='set_password'),
@@ -0,0 +1,36 @@
+from django.urls import path, re_path
+
+from api import async_views
+from api.urls import app_name, urlpatterns as sync_urlpatterns  # noqa: F401
+
+# Асинхронные версии самых частых запросов на чтение стоят перед
+# маршрутами DRF с теми же адресами и именами, остальное как в api.urls.
+urlpatterns = [
+    path(
+        'recipes/download_shopping_cart/',
+        async_views.download_shopping_cart,
+        name='get_ShoppingCart'
+    ),
+    path('recipes/', async_views.recipe_list, name='recipes-list'),
+    re_path(
+        r'^recipes/(?P<pk>[^/.]+)/$',
+        async_views.recipe_detail,
+        name='recipes-detail'
+    ),
+    path(
+        'ingredients/',
+        async_views.ingredient_list,
+        name='ingredients-list'
+    ),
+    re_path(
+        r'^ingredients/(?P<pk>[^/.]+)/$',
+        async_views.ingredient_detail,
+        name='ingredients-detail'
+    ),
+    path('tags/', async_views.tag_list, name='tags-list'),
+    re_path(
+        r'^tags/(?P<pk>[^/.]+)/$',
+        async_views.tag_detail,
+        name='tags-detail'
+    ),
+] + sync_urlpatterns
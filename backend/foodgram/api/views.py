@@ -1,66 +1,108 @@
-from django.contrib.auth.hashers import check_password, make_password
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, status, viewsets
-from rest_framework.decorators import api_view
+from rest_framework import status, viewsets
+from rest_framework.decorators import (api_view, permission_classes,
+                                       renderer_classes)
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from api.filters import IngredientSearchFilter, RecipeFilter
+from api.authentication import token_cache
+from api.filters import RecipeFilter, RecipeOrderingFilter
 from api.mixins import (CreateDestroyViewSet, CreateListRetrieveViewSet,
                         ListRetrieveViewSet)
-from api.pagination import PageNumberAsLimitOffset
-from api.permissions import IsReadOnly
-from api.serializers import (FavoriteSerializer, GetShoppingCartSerializer,
-                             IngredientSerializer, MeSerializer,
-                             MyUserSerializer, PasswordSerializer,
-                             RecipeCreateSerializer, RecipeSerializer,
-                             ShoppingCartSerializer, SubscriptionSerializer,
-                             TagSerializer)
-from food.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from api.pagination import (EstimatedCount, RecipePagination,
+                            SubscriptionPagination)
+from api.permissions import IsAdmin, IsReadOnly
+from api.renderers import (ShoppingListCSVRenderer, ShoppingListJSONRenderer,
+                           ShoppingListTxtRenderer)
+from api.serializers import (FavoriteSerializer, IngredientSerializer,
+                             JobSerializer, MeSerializer, MyUserSerializer,
+                             PasswordSerializer, RecipeCreateSerializer,
+                             RecipeSerializer, ShoppingCartSerializer,
+                             SubscriptionSerializer, TagSerializer)
+from food.catalog import ingredient_catalog, tag_registry
+from food.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                         ShoppingListItem, Tag)
+from jobs.models import Job
 from users.models import Subscription, User
+from users.passwords import hash_password, verify_password
 
 
 class UserViewSet(CreateListRetrieveViewSet):
     """Вьюсет для пользователей."""
     queryset = User.objects.all()
     serializer_class = MyUserSerializer
+    count_strategy = EstimatedCount()
 
     def perform_create(self, serializer):
         if ('password' in self.request.data):
-            password = make_password(self.request.data['password'])
+            password = hash_password(self.request.data['password'])
             serializer.save(password=password)
         else:
             serializer.save()
 
 
 class TagViewSet(ListRetrieveViewSet):
-    """Вьюсет для тегов."""
+    """Вьюсет для тегов, отдаются из справочника в памяти."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(tag_registry.all(), many=True)
+        return Response(serializer.data)
+
+    def retrieve(self, request, pk=None):
+        tag = tag_registry.get(int(pk)) if pk.isdigit() else None
+        if tag is None:
+            raise Http404
+        return Response(self.get_serializer(tag).data)
+
 
 class IngredientViewSet(ListRetrieveViewSet):
-    """Вьюсет для ингридиентов."""
+    """Вьюсет для ингридиентов, отдаются из справочника в памяти."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            ingredients = ingredient_catalog.all()
+        else:
+            ingredients = ingredient_catalog.search(name)
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
+    def retrieve(self, request, pk=None):
+        ingredient = ingredient_catalog.get(int(pk)) if pk.isdigit() else None
+        if ingredient is None:
+            raise Http404
+        return Response(self.get_serializer(ingredient).data)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет для рецептов."""
     queryset = Recipe.objects.all()
-    filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
     permission_classes = (IsReadOnly,)
-    ordering_fields = ('pub_date',)
+    ordering_fields = ('pub_date', 'favorites_count')
     ordering = ('-pub_date',)
 
+    def get_queryset(self):
+        if self.request.method not in SAFE_METHODS:
+            return Recipe.objects.all()
+        return Recipe.objects.with_user_flags(
+            self.request.user
+        ).select_related('document')
+
     def get_serializer_class(self):
         """Метод изменения класса сериализера при разных методах."""
         if self.request.method in SAFE_METHODS:
@@ -73,26 +115,38 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
 
-class GetSubscription(APIView, PageNumberAsLimitOffset):
+class GetSubscription(APIView, SubscriptionPagination):
     """Класс для переопределения запросов GET."""
 
     def get(self, request):
         """Получение подписок авторизаваного пользователя."""
         if request.user.is_authenticated:
-            user = get_object_or_404(User, id=request.user.id)
-            quersy = user.follower.all()
-            results = self.paginate_queryset(quersy, request, view=self)
             recipes_limit = self.request.query_params.get(
-                'recipes_limit'
+                'recipes_limit', settings.RECIPES_LIMIT
             )
-            if recipes_limit is not None:
-                try:
-                    recipes_limit = int(recipes_limit)
-                except ValueError:
-                    return Response(
-                        'Проверьте recipes_limit',
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+            try:
+                recipes_limit = int(recipes_limit)
+            except ValueError:
+                recipes_limit = -1
+            if recipes_limit < 0:
+                return Response(
+                    'Проверьте recipes_limit',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            quersy = Subscription.objects.filter(
+                user=request.user
+            ).select_related('subscriber').order_by('-id').prefetch_related(
+                Prefetch(
+                    'subscriber__recipes',
+                    queryset=Recipe.objects.latest_per_author(
+                        recipes_limit
+                    ).with_user_flags(
+                        request.user
+                    ).select_related('document'),
+                    to_attr='prefetched_recipes',
+                )
+            )
+            results = self.paginate_queryset(quersy, request, view=self)
             serializer = SubscriptionSerializer(
                 results,
                 many=True,
@@ -137,12 +191,14 @@ class SubscribeViewSet(CreateDestroyViewSet):
         context['recipes_limit'] = recipes_limit
         return context
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(
             user=self.request.user,
             subscriber=self.get_user()
         )
 
+    @transaction.atomic
     def delete(self, request, user_id):
         """Отписаться от автора."""
         subscription = get_object_or_404(
@@ -163,8 +219,11 @@ class FavoriteViewSet(CreateDestroyViewSet):
         return get_object_or_404(Recipe, pk=self.kwargs.get('recipe_id'))
 
     def get_queryset(self):
-        return self.request.user.favorites.all()
+        return Favorite.objects.filter(
+            user=self.request.user
+        ).select_related('recipe')
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(
             user=self.request.user,
@@ -176,6 +235,7 @@ class FavoriteViewSet(CreateDestroyViewSet):
         context['recipe_id'] = self.kwargs.get('recipe_id')
         return context
 
+    @transaction.atomic
     def delete(self, request, recipe_id):
         """Отписаться от автора."""
         favorite = get_object_or_404(
@@ -188,18 +248,29 @@ class FavoriteViewSet(CreateDestroyViewSet):
 
 
 @api_view(['GET'])
+@renderer_classes((
+    ShoppingListTxtRenderer, ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer
+))
 def get_ShoppingCart(request):
-    """Вьюха для получение списка покупок."""
+    """Вьюха для получение списка покупок в формате txt, csv или json."""
     if request.user.is_authenticated:
-        user = get_object_or_404(User, id=request.user.id)
-        serializer = GetShoppingCartSerializer(
-            user.user.all(),
-            context={'request': request}
+        shop_list = ShoppingListItem.objects.filter(
+            user=request.user
+        ).values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).order_by('ingredient__name')
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(shop_list.iterator()),
+            content_type=f'{renderer.media_type}; charset=utf-8'
         )
-        return HttpResponse(
-            serializer.data.get('shop_list'),
-            content_type='text/plain; charset=utf8'
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
         )
+        return response
     return Response(
         'Вы не авторизованы',
         status=status.HTTP_401_UNAUTHORIZED
@@ -215,8 +286,11 @@ class ShoppingCartViewSet(CreateDestroyViewSet):
         return get_object_or_404(Recipe, pk=self.kwargs.get('recipe_id'))
 
     def get_queryset(self):
-        return self.request.user.shoppingcart.all()
+        return ShoppingCart.objects.filter(
+            user=self.request.user
+        ).select_related('recipe')
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(
             user=self.request.user,
@@ -228,8 +302,9 @@ class ShoppingCartViewSet(CreateDestroyViewSet):
         context['recipe_id'] = self.kwargs.get('recipe_id')
         return context
 
+    @transaction.atomic
     def delete(self, request, recipe_id):
-        """Отписаться от автора."""
+        """Убрать рецепт из списка покупок."""
         shoppingcart = get_object_or_404(
             ShoppingCart,
             user=request.user,
@@ -243,8 +318,7 @@ class ShoppingCartViewSet(CreateDestroyViewSet):
 def get_me(request):
     """Вьюха для получение информации о текущем пользователе."""
     if request.user.is_authenticated:
-        user = get_object_or_404(User, id=request.user.id)
-        serializer = MeSerializer(user)
+        serializer = MeSerializer(request.user)
         return Response(serializer.data, status=status.HTTP_200_OK)
     return Response(
         'Вы не авторизованы',
@@ -260,13 +334,15 @@ def set_password(request):
     new_password = request.data.get('new_password')
     if serializer.is_valid():
         if request.user.is_authenticated:
-            user = get_object_or_404(
-                User, id=request.user.id
+            valid, _ = verify_password(
+                current_password, request.user.password
             )
-            if check_password(current_password, user.password):
+            if valid:
                 User.objects.filter(id=request.user.id).update(
-                    password=make_password(new_password)
+                    password=hash_password(new_password)
                 )
+                # update не отправляет post_save.
+                token_cache.invalidate(request.user.id)
                 return Response(
                     'Пароль изменен',
                     status=status.HTTP_204_NO_CONTENT
@@ -280,3 +356,25 @@ def set_password(request):
             status=status.HTTP_401_UNAUTHORIZED
         )
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@permission_classes((IsAdmin,))
+def token_cache_stats(request):
+    """Попадания в кэш токенов и их доля."""
+    return Response(token_cache.stats())
+
+
+class JobViewSet(ListRetrieveViewSet):
+    """
+    Вьюсет статусов фоновых задач пользователя,
+    администратор видит все задачи.
+    """
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+    count_strategy = EstimatedCount()
+
+    def get_queryset(self):
+        if self.request.user.is_admin:
+            return Job.objects.all()
+        return Job.objects.filter(user=self.request.user)
@@ -1,7 +1,9 @@
 from django.contrib import admin
+from django.db.models import Count
 
+from api.pagination import EstimatedCountPaginator
 from food.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                         ShoppingCart, Tag)
+                         ShoppingCart, ShoppingListItem, Tag)
 
 
 @admin.register(Tag)
@@ -9,12 +11,22 @@ class TagAdmin(admin.ModelAdmin):
     list_display = ('pk',
                     'name',
                     'color',
-                    'slug'
+                    'slug',
+                    'recipes_count',
                     )
     list_editable = ('name',)
     search_fields = ('name',)
     empty_value_display = '-пусто)))-'
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_count=Count('tagrecipe')
+        )
+
+    @admin.display(description='Рецептов', ordering='recipes_count')
+    def recipes_count(self, obj):
+        return obj.recipes_count
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -22,20 +34,32 @@ class IngredientAdmin(admin.ModelAdmin):
                     'name',
                     'measurement_unit',
                     )
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
     list_editable = ('name',)
-    search_fields = ('name',)
+    search_fields = ('^name',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто)))-'
 
 
 class RecipeTagInline(admin.TabularInline):
     model = Recipe.tags.through
     extra = 2
+    autocomplete_fields = ('tag',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('tag', 'recipe')
 
 
 class RecipeIngredientInline(admin.TabularInline):
     model = Recipe.ingredients.through
     extra = 3
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'ingredient', 'recipe'
+        )
 
 
 @admin.register(Recipe)
@@ -44,19 +68,25 @@ class RecipeAdmin(admin.ModelAdmin):
                     'name',
                     'author',
                     'count_favorite',
+                    'in_carts_count',
                     'pub_date',
                     )
-    readonly_fields = ('count_favorite',)
-    list_filter = ('name', 'author', 'tags')
+    readonly_fields = ('count_favorite', 'in_carts_count')
+    list_filter = ('tags',)
     list_editable = ('name',)
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
     inlines = (
         RecipeTagInline, RecipeIngredientInline,
     )
-    search_fields = ('author', 'name', 'tag')
+    search_fields = ('name', 'author__username')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто)))-'
 
+    @admin.display(description='В избранном', ordering='favorites_count')
     def count_favorite(self, obj):
-        return obj.favorites.all().count()
+        return obj.favorites_count
 
 
 @admin.register(Favorite)
@@ -65,6 +95,10 @@ class FavoriteAdmin(admin.ModelAdmin):
                     'user',
                     'recipe',
                     )
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто)))-'
 
 
@@ -75,6 +109,10 @@ class IngredientRecipeAdmin(admin.ModelAdmin):
                     'recipe',
                     'amount',
                     )
+    list_select_related = ('ingredient', 'recipe')
+    autocomplete_fields = ('ingredient', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто)))-'
 
 
@@ -84,4 +122,22 @@ class ShoppingCartAdmin(admin.ModelAdmin):
                     'user',
                     'recipe',
                     )
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто)))-'
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('pk',
+                    'user',
+                    'ingredient',
+                    'amount',
+                    )
+    list_select_related = ('user', 'ingredient')
+    autocomplete_fields = ('user', 'ingredient')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто)))-'
@@ -1,5 +1,35 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_save
 
 
 class FoodConfig(AppConfig):
     name = 'food'
+
+    def ready(self):
+        from food.catalog import ingredient_catalog, tag_registry
+        from food.counters import COUNTERS, counter_handlers
+        from food.images import recipe_image_saved
+        from food.models import (Ingredient, IngredientRecipe, Recipe,
+                                 ShoppingCart, Tag)
+        from food.search import index_recipe, unindex_recipe
+        from food.shopping_list import (cart_deleted, cart_saved,
+                                        ingredient_deleted, ingredient_saved,
+                                        remember)
+
+        post_save.connect(ingredient_catalog.invalidate, sender=Ingredient)
+        post_delete.connect(ingredient_catalog.invalidate, sender=Ingredient)
+        post_save.connect(tag_registry.invalidate, sender=Tag)
+        post_delete.connect(tag_registry.invalidate, sender=Tag)
+        post_save.connect(index_recipe, sender=Recipe)
+        post_delete.connect(unindex_recipe, sender=Recipe)
+        post_save.connect(recipe_image_saved, sender=Recipe)
+        for model in (ShoppingCart, IngredientRecipe):
+            pre_save.connect(remember, sender=model)
+        post_save.connect(cart_saved, sender=ShoppingCart)
+        post_delete.connect(cart_deleted, sender=ShoppingCart)
+        post_save.connect(ingredient_saved, sender=IngredientRecipe)
+        post_delete.connect(ingredient_deleted, sender=IngredientRecipe)
+        for model, field, related, link in COUNTERS:
+            saved, deleted = counter_handlers(model, field, link)
+            post_save.connect(saved, sender=related, weak=False)
+            post_delete.connect(deleted, sender=related, weak=False)
@@ -0,0 +1,198 @@
+import bisect
+import threading
+import time
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+Snapshot = namedtuple(
+    'Snapshot', ('version', 'loaded_at', 'checked_at', 'by_id', 'indexes')
+)
+
+
+def fold(text):
+    """Приводит строку к виду для поиска: без регистра, ё как е."""
+    return text.casefold().replace('ё', 'е')
+
+
+class Catalog:
+    """
+    Справочник объектов модели model ('приложение.Модель') в памяти
+    процесса только для чтения, по порядку ordering.
+    Загружается при старте процесса (warm_catalogs) или при первом
+    обращении и перезагружается, когда меняется версия version_key
+    в кэше (объекты сохранены или удалены) или прошло CATALOG_TTL секунд.
+    Версия читается из кэша не чаще раза в CACHE_VERSION_CHECK_INTERVAL
+    секунд.
+    """
+    model = None
+    ordering = ('id',)
+    version_key = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def get_queryset(self):
+        return apps.get_model(self.model).objects.order_by(*self.ordering)
+
+    def build_indexes(self, objects):
+        """Дополнительные индексы снимка по списку объектов."""
+        return {}
+
+    def invalidate(self, **kwargs):
+        """Помечает справочник устаревшим во всех процессах."""
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 1, None)
+        self._snapshot = None
+
+    def _is_fresh(self, snapshot, version):
+        return (
+            snapshot is not None
+            and snapshot.version == version
+            and time.monotonic() - snapshot.loaded_at < settings.CATALOG_TTL
+        )
+
+    def _checked(self):
+        """Снимок, версия которого проверена недавно, иначе None."""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if (
+            snapshot is not None
+            and now - snapshot.checked_at
+            < settings.CACHE_VERSION_CHECK_INTERVAL
+            and now - snapshot.loaded_at < settings.CATALOG_TTL
+        ):
+            return snapshot
+        return None
+
+    def _load(self, version):
+        objects = list(self.get_queryset())
+        now = time.monotonic()
+        return Snapshot(
+            version=version,
+            loaded_at=now,
+            checked_at=now,
+            by_id={obj.id: obj for obj in objects},
+            indexes=self.build_indexes(objects),
+        )
+
+    def snapshot(self):
+        snapshot = self._checked()
+        if snapshot is not None:
+            return snapshot
+        version = cache.get(self.version_key, 0)
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot, version):
+            snapshot = self._snapshot = snapshot._replace(
+                checked_at=time.monotonic()
+            )
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if not self._is_fresh(snapshot, version):
+                snapshot = self._snapshot = self._load(version)
+        return snapshot
+
+    async def asnapshot(self):
+        """
+        snapshot для асинхронных view: недавно проверенный снимок
+        отдаётся сразу, проверка версии в кэше и загрузка из базы
+        идут в потоке.
+        """
+        snapshot = self._checked()
+        if snapshot is not None:
+            return snapshot
+        return await sync_to_async(self.snapshot)()
+
+    def all(self, snapshot=None):
+        """Все объекты в порядке get_queryset."""
+        return list((snapshot or self.snapshot()).by_id.values())
+
+    def get(self, pk, snapshot=None):
+        """Объект по id или None."""
+        return (snapshot or self.snapshot()).by_id.get(pk)
+
+    def in_bulk(self, ids):
+        """Словарь {id: объект} для найденных ids."""
+        by_id = self.snapshot().by_id
+        return {pk: by_id[pk] for pk in ids if pk in by_id}
+
+
+class IngredientCatalog(Catalog):
+    """Справочник ингридиентов с поиском по названию."""
+    model = 'food.Ingredient'
+    version_key = 'ingredient_catalog_version'
+
+    def build_indexes(self, objects):
+        by_name = sorted(
+            objects,
+            key=lambda ingredient: (fold(ingredient.name), ingredient.id)
+        )
+        return {
+            'keys': [fold(ingredient.name) for ingredient in by_name],
+            'by_name': by_name,
+        }
+
+    def search(self, name, snapshot=None):
+        """
+        Ингридиенты, в названии которых есть name: сначала те,
+        что начинаются с name, затем остальные, внутри по алфавиту.
+        """
+        snapshot = snapshot or self.snapshot()
+        name = fold(name.strip())
+        if not name:
+            return list(snapshot.by_id.values())
+        keys = snapshot.indexes['keys']
+        by_name = snapshot.indexes['by_name']
+        start = bisect.bisect_left(keys, name)
+        end = start
+        while end < len(keys) and keys[end].startswith(name):
+            end += 1
+        contains = [
+            ingredient
+            for index, (key, ingredient) in enumerate(zip(keys, by_name))
+            if (index < start or index >= end) and name in key
+        ]
+        return by_name[start:end] + contains
+
+
+class TagRegistry(Catalog):
+    """Справочник тегов с поиском по слагу."""
+    model = 'food.Tag'
+    version_key = 'tag_registry_version'
+
+    def build_indexes(self, objects):
+        return {'by_slug': {tag.slug: tag for tag in objects}}
+
+    def slugs(self):
+        """Все слаги тегов."""
+        return list(self.snapshot().indexes['by_slug'])
+
+
+ingredient_catalog = IngredientCatalog()
+tag_registry = TagRegistry()
+
+
+def warm_catalogs():
+    """
+    Загружает справочники при старте процесса сервера, чтобы первые
+    запросы не ждали базу. Без базы или таблиц (до миграций)
+    справочники загрузятся при первом обращении.
+    """
+    for catalog in (ingredient_catalog, tag_registry):
+        try:
+            catalog.snapshot()
+        except DatabaseError:
+            pass
+    # Соединение открыто при импорте, запросам оно не нужно.
+    # Соединение внутри транзакции (тесты) закрывать нельзя.
+    for connection in connections.all():
+        if not connection.in_atomic_block:
+            connection.close()
@@ -0,0 +1,74 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from food.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+# (модель со счётчиком, поле счётчика, считаемая модель, поле связи)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'subscriber'),
+)
+
+
+def actual_count(related, link):
+    """Выражение: число объектов related, ссылающихся на строку."""
+    return Coalesce(
+        Subquery(
+            related.objects.filter(
+                **{link: OuterRef('pk')}
+            ).order_by().values(link).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0,
+    )
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счётчик одной строки на delta."""
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def counter_handlers(model, field, link):
+    """Обработчики post_save и post_delete для одного счётчика."""
+    def saved(sender, instance, created=False, **kwargs):
+        if created:
+            change_counter(model, getattr(instance, f'{link}_id'), field, 1)
+
+    def deleted(sender, instance, **kwargs):
+        change_counter(model, getattr(instance, f'{link}_id'), field, -1)
+
+    return saved, deleted
+
+
+def drift():
+    """
+    Расхождения счётчиков с фактическими данными:
+    {(модель, поле, pk): (в счётчике, фактически)}.
+    """
+    result = {}
+    for model, field, related, link in COUNTERS:
+        rows = model.objects.annotate(
+            actual=actual_count(related, link)
+        ).exclude(**{field: F('actual')}).values_list(
+            'pk', field, 'actual'
+        )
+        for pk, stored, actual in rows:
+            result[(model._meta.label, field, pk)] = (stored, actual)
+    return result
+
+
+def reconcile(drifted):
+    """Пересчитывает счётчики строк из drift."""
+    for model, field, related, link in COUNTERS:
+        pks = [
+            pk for label, drifted_field, pk in drifted
+            if label == model._meta.label and drifted_field == field
+        ]
+        if pks:
+            model.objects.filter(pk__in=pks).update(
+                **{field: actual_count(related, link)}
+            )
@@ -0,0 +1,176 @@
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from food.models import Recipe, RecipeDocument
+from jobs.queue import enqueue
+
+RENDITIONS_DIR = 'recipe/renditions'
+
+EXTENSIONS = {
+    'JPEG': ('.jpg', '.jpeg'),
+    'PNG': ('.png',),
+}
+
+
+def encode(image, image_format):
+    """Кодирует картинку без метаданных (EXIF, ICC, текст PNG)."""
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=settings.IMAGE_QUALITY,
+                   optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=settings.IMAGE_QUALITY, method=4)
+    else:
+        image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def open_image(file):
+    """
+    Картинка с учтённым поворотом из EXIF, в RGB или RGBA,
+    уменьшенная до IMAGE_MAX_SIZE по большей стороне.
+    """
+    with Image.open(file) as source:
+        source.load()
+        image = ImageOps.exif_transpose(source)
+    has_alpha = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    image.thumbnail(
+        (settings.IMAGE_MAX_SIZE, settings.IMAGE_MAX_SIZE), Image.LANCZOS
+    )
+    return image, 'PNG' if has_alpha else 'JPEG'
+
+
+def resize(image, width):
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def render_renditions(recipe_id, image, image_format, storage, stem):
+    """
+    Сохраняет копии фиксированной ширины в исходном формате и WebP.
+    Возвращает [{width, image, webp}] с путями в хранилище,
+    копии шире картинки не делаются.
+    """
+    extension = EXTENSIONS[image_format][0]
+    directory = f'{RENDITIONS_DIR}/{recipe_id}'
+    items = []
+    for width in sorted(set(
+        min(width, image.width)
+        for width in settings.IMAGE_RENDITION_WIDTHS
+    )):
+        rendition = resize(image, width)
+        items.append({
+            'width': width,
+            'image': storage.save(
+                f'{directory}/{stem}_{width}{extension}',
+                ContentFile(encode(rendition, image_format)),
+            ),
+            'webp': storage.save(
+                f'{directory}/{stem}_{width}.webp',
+                ContentFile(encode(rendition, 'WEBP')),
+            ),
+        })
+    return items
+
+
+def rendition_names(renditions):
+    return [
+        name
+        for item in renditions.get('items', ())
+        for name in (item['image'], item['webp'])
+    ]
+
+
+def delete_files(storage, names):
+    for name in names:
+        storage.delete(name)
+
+
+def save_original(storage, source, image, image_format):
+    """
+    Сохраняет обработанную картинку вместо исходной.
+    Имя файла сохраняется, если расширение подходит к формату,
+    чтобы не менялась уже отданная клиентам ссылка.
+    """
+    stem, extension = posixpath.splitext(source)
+    if extension.lower() in EXTENSIONS[image_format]:
+        storage.delete(source)
+        name = source
+    else:
+        name = f'{stem}{EXTENSIONS[image_format][0]}'
+    return storage.save(name, ContentFile(encode(image, image_format)))
+
+
+def process_recipe_image(recipe_id, force=False):
+    """
+    Обрабатывает загруженную картинку рецепта: убирает метаданные,
+    ограничивает размер и делает уменьшенные копии.
+    Картинка, уже обработанная (её имя в image_renditions['source']),
+    без force не трогается. Возвращает True, если картинка обработана.
+    """
+    recipe = Recipe.objects.filter(id=recipe_id).only(
+        'id', 'image', 'image_renditions'
+    ).first()
+    if recipe is None:
+        return False
+    storage = recipe.image.storage
+    source = recipe.image.name
+    renditions = recipe.image_renditions or {}
+    if not force and is_processed(recipe):
+        return False
+    image_name, items = '', []
+    if source:
+        with recipe.image.open('rb') as file:
+            image, image_format = open_image(file)
+        image_name = save_original(storage, source, image, image_format)
+        items = render_renditions(
+            recipe_id, image, image_format, storage,
+            posixpath.splitext(posixpath.basename(image_name))[0],
+        )
+    new_renditions = {'source': image_name, 'items': items}
+    with transaction.atomic():
+        updated = Recipe.objects.filter(id=recipe_id, image=source).update(
+            image=image_name, image_renditions=new_renditions
+        )
+        RecipeDocument.objects.filter(recipe_id=recipe_id).delete()
+    if not updated:
+        stale = rendition_names(new_renditions)
+        if image_name != source:
+            stale.append(image_name)
+        delete_files(storage, stale)
+        return False
+    stale = rendition_names(renditions)
+    if image_name != source:
+        stale.append(source)
+    delete_files(storage, stale)
+    return True
+
+
+def is_processed(recipe):
+    renditions = recipe.image_renditions or {}
+    return recipe.image.name == renditions.get('source', '')
+
+
+def recipe_image_saved(sender, instance, update_fields=None, **kwargs):
+    """Ставит новую картинку рецепта в очередь на обработку."""
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if is_processed(instance):
+        return
+    enqueue(
+        'food.process_recipe_image',
+        instance.id,
+        priority=10,
+        dedup_key=f'recipe-image:{instance.id}',
+        user_id=instance.author_id,
+    )
@@ -1,31 +1,16 @@
-import json
-import sys
+import os
 
-from django.core.management.base import BaseCommand
+from food.management.commands.load_ingredients import \
+    Command as LoadIngredientsCommand
 
-from food.models import Ingredient
 
-
-class Command(BaseCommand):
+class Command(LoadIngredientsCommand):
     """
-    Команда для извлеения данных из csv.
-    Запуск python manage.py command имя сsv файла.
+    Прежнее имя команды load_ingredients.
+    Запуск python manage.py command ingredients
+    загружает data/ingredients.json.
     """
-    help = 'Создает Данные из csv, параметр название файла'
-
-    def add_arguments(self, parser):
-        parser.add_argument('file', type=str, help='Путь к файлу')
-
     def handle(self, *args, **kwargs):
-        file_name = kwargs['file']
-        file = f'data/{file_name}.json'
-        try:
-            with open(file, "r", encoding="utf-8-sig") as json_file:
-                data = json.load(json_file)
-                for row in data:
-                    Ingredient.objects.update_or_create(
-                        **row
-                    )
-        except IOError:
-            print("Нет файла!")
-            sys.exit()
+        if not os.path.exists(kwargs['path']):
+            kwargs['path'] = f'data/{kwargs["path"]}.json'
+        return super().handle(*args, **kwargs)
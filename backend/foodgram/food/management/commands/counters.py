@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from food.counters import drift, reconcile
+from jobs.queue import enqueue
+
+
+class Command(BaseCommand):
+    """
+    Команда для сверки счётчиков избранного, списков покупок,
+    рецептов и подписчиков.
+    Запуск python manage.py counters [--check | --enqueue].
+    """
+    help = 'Исправляет счётчики, с --check только ищет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, ничего не меняя',
+        )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Поставить исправление в очередь фоновых задач',
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['enqueue']:
+            job = enqueue(
+                'food.reconcile_counters', dedup_key='reconcile-counters'
+            )
+            self.stdout.write(self.style.SUCCESS(f'Задача {job.id}'))
+            return
+        drifted = drift()
+        for (label, field, pk), (stored, actual) in sorted(drifted.items()):
+            self.stdout.write(f'{label} pk={pk} {field}: {stored} != {actual}')
+        if kwargs['check']:
+            if drifted:
+                raise CommandError(f'Расхождений: {len(drifted)}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        reconcile(drifted)
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики исправлены: {len(drifted)}'
+        ))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from food.images import is_processed, process_recipe_image
+from food.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Команда для обработки уже загруженных картинок рецептов:
+    без метаданных, с ограниченным размером и уменьшенными копиями.
+    Запуск python manage.py image_renditions [--check] [--force].
+    """
+    help = 'Делает уменьшенные копии картинок рецептов, где их нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только найти необработанные картинки',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Обработать заново все картинки, например после '
+                 'изменения IMAGE_RENDITION_WIDTHS',
+        )
+
+    def pending(self, force):
+        """id рецептов, картинки которых нужно обработать."""
+        return [
+            recipe.id
+            for recipe in Recipe.objects.only(
+                'id', 'image', 'image_renditions'
+            ).order_by('id').iterator()
+            if not is_processed(recipe) or (force and recipe.image)
+        ]
+
+    def handle(self, *args, **kwargs):
+        ids = self.pending(kwargs['force'])
+        if kwargs['check']:
+            if ids:
+                raise CommandError(
+                    f'Необработанных картинок: {len(ids)}'
+                )
+            self.stdout.write(self.style.SUCCESS('Все картинки обработаны'))
+            return
+        processed = failed = 0
+        for recipe_id in ids:
+            try:
+                processed += process_recipe_image(
+                    recipe_id, force=kwargs['force']
+                )
+            except (OSError, Image.DecompressionBombError) as error:
+                failed += 1
+                self.stderr.write(f'recipe={recipe_id}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {processed}, с ошибкой: {failed}'
+        ))
@@ -0,0 +1,225 @@
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from food.catalog import fold, ingredient_catalog
+from food.models import Ingredient, RecipeDocument
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json(file):
+    """Объекты JSON массива по одному, без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON массив')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            obj, end = decoder.raw_decode(buffer)
+        except ValueError:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Неверный JSON')
+            buffer += chunk
+            continue
+        yield obj
+        buffer = buffer[end:]
+
+
+def iter_csv(file):
+    """Строки csv name,measurement_unit, заголовок необязателен."""
+    for row in csv.reader(file):
+        if not row or row == ['name', 'measurement_unit']:
+            continue
+        if len(row) != 2:
+            raise CommandError(f'Неверная строка csv: {row}')
+        yield {'name': row[0], 'measurement_unit': row[1]}
+
+
+def iter_batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    """
+    Команда для загрузки ингридиентов из json или csv.
+    Запуск python manage.py load_ingredients путь_к_файлу
+    [--format json|csv] [--batch-size N] [--dry-run].
+    Ингридиент ищется по названию и единице измерения: новые
+    добавляются, существующие не меняются. С --fix-names строка,
+    которая отличается от единственного существующего ингридиента
+    только регистром и ё, исправляет его название вместо добавления.
+    """
+    help = 'Загружает ингридиенты из json или csv файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Путь к файлу')
+        parser.add_argument(
+            '--format',
+            choices=('json', 'csv'),
+            help='Формат файла, по умолчанию по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк обрабатывать за раз',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать изменения, ничего не записывая',
+        )
+        parser.add_argument(
+            '--fix-names',
+            action='store_true',
+            help=(
+                'Исправлять написание существующих названий, '
+                'отличающихся только регистром и ё'
+            ),
+        )
+
+    def get_rows(self, file, file_format):
+        rows = iter_json(file) if file_format == 'json' else iter_csv(file)
+        for row in rows:
+            try:
+                name = row['name'].strip()
+                measurement_unit = row['measurement_unit'].strip()
+            except (KeyError, TypeError, AttributeError):
+                raise CommandError(f'Неверная строка: {row}')
+            if not name or not measurement_unit:
+                raise CommandError(f'Пустое значение: {row}')
+            yield name, measurement_unit
+
+    def load_existing(self):
+        """
+        Индексы существующих ингридиентов: {(название, единица):
+        ингридиент} и {(свёрнутое название, единица): [ингридиенты]}.
+        """
+        self.existing = {}
+        self.folded = {}
+        for ingredient in Ingredient.objects.only(
+            'id', 'name', 'measurement_unit'
+        ).order_by('id').iterator():
+            self.existing[
+                ingredient.name, ingredient.measurement_unit
+            ] = ingredient
+            self.folded.setdefault(
+                (fold(ingredient.name), ingredient.measurement_unit), []
+            ).append(ingredient)
+        self.seen = set()
+        self.renamed = set()
+
+    def find_misspelled(self, name, measurement_unit):
+        """
+        Единственный существующий ингридиент, который отличается
+        только регистром и ё и ещё не исправлялся, иначе None.
+        """
+        key = (fold(name), measurement_unit)
+        candidates = self.folded.get(key, ())
+        if len(candidates) != 1 or key in self.renamed:
+            return None
+        return candidates[0]
+
+    def process_batch(self, batch, dry_run, fix_names):
+        """Возвращает (добавлено, изменено, без изменений) для пачки."""
+        created = []
+        updated = []
+        for name, measurement_unit in batch:
+            key = (name, measurement_unit)
+            if key in self.seen:
+                continue
+            self.seen.add(key)
+            if key in self.existing:
+                continue
+            ingredient = None
+            if fix_names:
+                ingredient = self.find_misspelled(name, measurement_unit)
+            if ingredient is None:
+                ingredient = Ingredient(
+                    name=name, measurement_unit=measurement_unit
+                )
+                created.append(ingredient)
+                self.log(dry_run, f'+ {name} ({measurement_unit})')
+            else:
+                self.log(
+                    dry_run,
+                    f'~ {ingredient.name} -> {name} ({measurement_unit})'
+                )
+                del self.existing[ingredient.name, measurement_unit]
+                self.renamed.add((fold(name), measurement_unit))
+                ingredient.name = name
+                updated.append(ingredient)
+            self.existing[key] = ingredient
+        if not dry_run:
+            Ingredient.objects.bulk_create(created, ignore_conflicts=True)
+            Ingredient.objects.bulk_update(updated, ('name',))
+            if updated:
+                RecipeDocument.objects.filter(
+                    recipe__ingredients__in=updated
+                ).delete()
+        return (
+            len(created),
+            len(updated),
+            len(batch) - len(created) - len(updated),
+        )
+
+    def log(self, dry_run, line):
+        if dry_run or self.verbosity > 1:
+            self.stdout.write(line)
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['path']
+        file_format = kwargs['format'] or os.path.splitext(path)[1][1:]
+        if file_format not in ('json', 'csv'):
+            raise CommandError('Укажите --format json или csv')
+        if kwargs['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        dry_run = kwargs['dry_run']
+        self.verbosity = kwargs['verbosity']
+        start = time.monotonic()
+        totals = [0, 0, 0]
+        self.load_existing()
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as file:
+                with transaction.atomic():
+                    for batch in iter_batches(
+                        self.get_rows(file, file_format),
+                        kwargs['batch_size'],
+                    ):
+                        for index, count in enumerate(
+                            self.process_batch(
+                                batch, dry_run, kwargs['fix_names']
+                            )
+                        ):
+                            totals[index] += count
+                        if self.verbosity > 0:
+                            self.stderr.write(
+                                f'Обработано строк: {sum(totals)}'
+                            )
+        except OSError as error:
+            raise CommandError(f'Нет файла: {error}')
+        if not dry_run and (totals[0] or totals[1]):
+            ingredient_catalog.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Было бы: " if dry_run else ""}'
+            f'добавлено {totals[0]}, изменено {totals[1]}, '
+            f'без изменений {totals[2]} '
+            f'за {time.monotonic() - start:.2f} с'
+        ))
@@ -0,0 +1,207 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+BATCH_SIZE = 5000
+
+TAGS = 10
+
+INGREDIENTS = 2000
+
+RECIPES_PER_AUTHOR = 10
+
+TAGS_PER_RECIPE = 2
+
+INGREDIENTS_PER_RECIPE = 6
+
+LETTERS = 'абвгдежзиклмнопрстуфхцчшщэюя'
+
+
+def applied_apps():
+    """
+    Модели в состоянии применённых миграций, а не текущего кода:
+    команда работает и до, и после миграций с индексами.
+    """
+    loader = MigrationLoader(connection)
+    applied = set(loader.applied_migrations)
+    leaves = [
+        node for node in applied
+        if node in loader.graph.nodes
+        and not set(loader.graph.node_map[node].children) & applied
+    ]
+    return loader.project_state(leaves).apps
+
+
+class Command(BaseCommand):
+    """
+    Команда для сравнения планов и времени основных запросов
+    до и после миграций с индексами на одних и тех же данных.
+    Запуск python manage.py query_plans [--seed N] [--repeat N].
+    Сравнение на пустой базе:
+    python manage.py migrate food 0009 && python manage.py migrate users 0007
+    python manage.py query_plans --seed 50000
+    python manage.py migrate && python manage.py query_plans
+    """
+    help = 'Печатает план и медианное время основных запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            metavar='RECIPES',
+            help=(
+                'Сначала заполнить пустую базу одинаковыми при каждом '
+                'запуске данными с RECIPES рецептами'
+            ),
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз выполнить каждый запрос',
+        )
+
+    def seed(self, apps, recipes_count):
+        """
+        Заполняет базу через bulk_create, без сигналов: счётчики,
+        документы и поиск для этих данных не собираются.
+        """
+        Recipe = apps.get_model('food', 'Recipe')
+        if Recipe.objects.exists():
+            raise CommandError('--seed заполняет только пустую базу')
+        User = apps.get_model(settings.AUTH_USER_MODEL)
+        Tag = apps.get_model('food', 'Tag')
+        Ingredient = apps.get_model('food', 'Ingredient')
+        TagRecipe = apps.get_model('food', 'TagRecipe')
+        IngredientRecipe = apps.get_model('food', 'IngredientRecipe')
+        # Даты задаются явно, чтобы порядок ленты не совпадал с id.
+        Recipe._meta.get_field('pub_date').auto_now_add = False
+        rng = random.Random(0)
+        authors_count = max(1, recipes_count // RECIPES_PER_AUTHOR)
+        with transaction.atomic():
+            User.objects.bulk_create((
+                User(
+                    username=f'user{number}',
+                    email=f'User{number}@Example.com',
+                    password='!',
+                )
+                for number in range(authors_count)
+            ), batch_size=BATCH_SIZE)
+            Tag.objects.bulk_create(
+                Tag(name=f'Тег {number}', color=f'#{number:06X}',
+                    slug=f'tag{number}')
+                for number in range(TAGS)
+            )
+            Ingredient.objects.bulk_create((
+                Ingredient(
+                    name=''.join(rng.choices(LETTERS, k=8)) + f' {number}',
+                    measurement_unit='г',
+                )
+                for number in range(INGREDIENTS)
+            ), batch_size=BATCH_SIZE)
+            user_ids = list(User.objects.values_list('id', flat=True))
+            tag_ids = list(Tag.objects.values_list('id', flat=True))
+            ingredient_ids = list(
+                Ingredient.objects.values_list('id', flat=True)
+            )
+            now = timezone.now()
+            Recipe.objects.bulk_create((
+                Recipe(
+                    author_id=rng.choice(user_ids),
+                    name=f'Рецепт {number}',
+                    text='Описание',
+                    cooking_time=rng.randint(1, 120),
+                    pub_date=now - timedelta(
+                        minutes=rng.randint(0, 60 * 24 * 365)
+                    ),
+                )
+                for number in range(recipes_count)
+            ), batch_size=BATCH_SIZE)
+            recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+            TagRecipe.objects.bulk_create((
+                TagRecipe(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in rng.sample(tag_ids, TAGS_PER_RECIPE)
+            ), batch_size=BATCH_SIZE)
+            IngredientRecipe.objects.bulk_create((
+                IngredientRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 100),
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(
+                    ingredient_ids, INGREDIENTS_PER_RECIPE
+                )
+            ), batch_size=BATCH_SIZE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено рецептов: {recipes_count}, авторов: {authors_count}'
+        ))
+
+    def get_queries(self, apps):
+        """Запросы {название: queryset} по данным текущей базы."""
+        Recipe = apps.get_model('food', 'Recipe')
+        Tag = apps.get_model('food', 'Tag')
+        Ingredient = apps.get_model('food', 'Ingredient')
+        TagRecipe = apps.get_model('food', 'TagRecipe')
+        IngredientRecipe = apps.get_model('food', 'IngredientRecipe')
+        User = apps.get_model(settings.AUTH_USER_MODEL)
+        recipe = Recipe.objects.order_by('id').first()
+        tag = Tag.objects.order_by('id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        user = User.objects.order_by('id').first()
+        if None in (recipe, tag, ingredient, user):
+            return {}
+        return {
+            'лента рецептов': Recipe.objects.order_by(
+                '-pub_date', '-id'
+            )[:6],
+            'рецепты автора': Recipe.objects.filter(
+                author_id=recipe.author_id
+            ).order_by('-pub_date', '-id')[:3],
+            'тег рецепта': TagRecipe.objects.filter(
+                recipe=recipe, tag=tag
+            ),
+            'ингридиент рецепта': IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient=ingredient
+            ),
+            'ингридиенты по префиксу': Ingredient.objects.annotate(
+                name_upper=Upper('name')
+            ).filter(name_upper__startswith=ingredient.name[:3].upper()),
+            'пользователь по email': User.objects.annotate(
+                email_upper=Upper('email')
+            ).filter(email_upper=user.email.upper()),
+        }
+
+    def handle(self, *args, **kwargs):
+        apps = applied_apps()
+        if kwargs['seed']:
+            self.seed(apps, kwargs['seed'])
+        queries = self.get_queries(apps)
+        if not queries:
+            self.stdout.write('Нет данных для запросов')
+            return
+        self.stdout.write(f'База: {connection.vendor}')
+        if connection.vendor == 'postgresql':
+            # Статистика после заполнения и миграций, иначе планы
+            # строятся по устаревшим оценкам числа строк.
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(kwargs['repeat']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: {statistics.median(timings) * 1000:.3f} мс'
+            ))
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from food.search import rebuild_index
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересборки полнотекстового индекса рецептов.
+    Запуск python manage.py search_index.
+    Нужна только для SQLite, в PostgreSQL индекс обновляет сама база.
+    """
+    help = 'Пересобирает полнотекстовый индекс рецептов (SQLite FTS5)'
+
+    def handle(self, *args, **kwargs):
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Индекс рецептов пересобран'))
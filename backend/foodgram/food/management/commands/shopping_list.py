@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from food.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересборки сводных списков покупок.
+    Запуск python manage.py shopping_list [--check].
+    """
+    help = 'Пересобирает списки покупок, с --check только ищет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, ничего не меняя',
+        )
+
+    def handle(self, *args, **kwargs):
+        drift = ShoppingListItem.objects.drift()
+        for (user_id, ingredient_id), (actual, expected) in sorted(
+            drift.items()
+        ):
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'{actual} != {expected}'
+            )
+        if kwargs['check']:
+            if drift:
+                raise CommandError(f'Расхождений: {len(drift)}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        ShoppingListItem.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, исправлено: {len(drift)}'
+        ))
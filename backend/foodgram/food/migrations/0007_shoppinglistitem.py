@@ -0,0 +1,53 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_list(apps, schema_editor):
+    IngredientRecipe = apps.get_model('food', 'IngredientRecipe')
+    ShoppingListItem = apps.get_model('food', 'ShoppingListItem')
+    totals = IngredientRecipe.objects.filter(
+        recipe__shoppingcart__isnull=False
+    ).values(
+        'ingredient', user=models.F('recipe__shoppingcart__user')
+    ).annotate(total=models.Sum('amount')).order_by()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row['user'],
+            ingredient_id=row['ingredient'],
+            amount=row['total'],
+        )
+        for row in totals.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('food', '0006_alter_tag_color'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество ингридиента')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to='food.ingredient', verbose_name='Ингридиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'ПозицияСпискаПокупок',
+                'verbose_name_plural': 'ПозицииСпискаПокупок',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_ingredient_shoppinglistitem'),
+        ),
+        migrations.RunPython(fill_shopping_list, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+from food.catalog import fold
+
+POSTGRESQL_FORWARD = (
+    """
+    ALTER TABLE food_recipe ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector(
+            'russian', replace(lower(coalesce(name, '')), 'ё', 'е')
+        ), 'A')
+        || setweight(to_tsvector(
+            'russian', replace(lower(coalesce(text, '')), 'ё', 'е')
+        ), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX food_recipe_search_vector_gin '
+    'ON food_recipe USING gin (search_vector)',
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS food_recipe_search_vector_gin',
+    'ALTER TABLE food_recipe DROP COLUMN IF EXISTS search_vector',
+)
+SQLITE_FORWARD = (
+    "CREATE VIRTUAL TABLE food_recipe_fts USING fts5("
+    "name, text, tokenize='unicode61 remove_diacritics 2')",
+)
+SQLITE_BACKWARD = (
+    'DROP TABLE IF EXISTS food_recipe_fts',
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRESQL_FORWARD:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_FORWARD:
+            schema_editor.execute(sql)
+        Recipe = apps.get_model('food', 'Recipe')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO food_recipe_fts (rowid, name, text) '
+                'VALUES (%s, %s, %s)',
+                [
+                    (recipe_id, fold(name), fold(text))
+                    for recipe_id, name, text in Recipe.objects.values_list(
+                        'id', 'name', 'text'
+                    )
+                ],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRESQL_BACKWARD:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_BACKWARD:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0007_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0008_recipe_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeDocument',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='food.recipe', verbose_name='Рецепт')),
+                ('data', models.JSONField(verbose_name='Представление рецепта')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'документ_рецепта',
+                'verbose_name_plural': 'документы_рецептов',
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+from foodgram.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('food', '0009_recipedocument'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='food_recipe_pub_date_id_idx'),
+        ),
+    ]
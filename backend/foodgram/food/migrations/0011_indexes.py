@@ -0,0 +1,113 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+from django.db.models.functions import Upper
+
+from foodgram.operations import (AddIndexConcurrently,
+                                 AddUniqueConstraintConcurrently)
+
+
+def rebuild_shopping_lists(apps, recipe_ids):
+    """
+    Пересобирает списки покупок пользователей, у которых в корзине
+    есть рецепты recipe_ids, по корзинам.
+    """
+    IngredientRecipe = apps.get_model('food', 'IngredientRecipe')
+    ShoppingCart = apps.get_model('food', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('food', 'ShoppingListItem')
+    user_ids = set(
+        ShoppingCart.objects.filter(
+            recipe__in=recipe_ids
+        ).values_list('user_id', flat=True)
+    )
+    if not user_ids:
+        return
+    ShoppingListItem.objects.filter(user__in=user_ids).delete()
+    totals = IngredientRecipe.objects.filter(
+        recipe__shoppingcart__user__in=user_ids
+    ).values(
+        'ingredient', user=models.F('recipe__shoppingcart__user')
+    ).annotate(total=models.Sum('amount')).order_by()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row['user'],
+            ingredient_id=row['ingredient'],
+            amount=row['total'],
+        )
+        for row in totals.iterator()
+    )
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Оставляет по одной связи рецепта с тегом и ингридиентом.
+    Документы рецептов с удалёнными связями удаляются и соберутся
+    при чтении, списки покупок с ними пересобираются.
+    """
+    changed = set()
+    for model_name, field in (
+        ('IngredientRecipe', 'ingredient'), ('TagRecipe', 'tag')
+    ):
+        model = apps.get_model('food', model_name)
+        duplicates = model.objects.values('recipe', field).annotate(
+            count=Count('id'), first_id=Min('id')
+        ).order_by().filter(count__gt=1)
+        for duplicate in duplicates:
+            model.objects.filter(
+                recipe=duplicate['recipe'], **{field: duplicate[field]}
+            ).exclude(id=duplicate['first_id']).delete()
+            changed.add((model_name, duplicate['recipe']))
+    if not changed:
+        return
+    apps.get_model('food', 'RecipeDocument').objects.filter(
+        recipe__in={recipe_id for _, recipe_id in changed}
+    ).delete()
+    rebuild_shopping_lists(apps, {
+        recipe_id for model_name, recipe_id in changed
+        if model_name == 'IngredientRecipe'
+    })
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('food', '0010_recipe_pub_date_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicates, migrations.RunPython.noop, atomic=True
+        ),
+        AddIndexConcurrently(
+            model_name='ingredient',
+            index=models.Index(
+                Upper('name'), name='food_ingredient_name_upper'
+            ),
+            # text_pattern_ops для UPPER(name) LIKE 'префикс%' (istartswith).
+            sql=(
+                'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+                'food_ingredient_name_upper '
+                'ON food_ingredient (UPPER(name) text_pattern_ops)'
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='food_recipe_author_date_idx',
+            ),
+        ),
+        AddUniqueConstraintConcurrently(
+            model_name='ingredientrecipe',
+            constraint=models.UniqueConstraint(
+                fields=('recipe', 'ingredient'),
+                name='unique_recipe_ingredient',
+            ),
+        ),
+        AddUniqueConstraintConcurrently(
+            model_name='tagrecipe',
+            constraint=models.UniqueConstraint(
+                fields=('recipe', 'tag'), name='unique_recipe_tag'
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('food', 'Recipe', 'favorites_count', 'food', 'Favorite', 'recipe'),
+    ('food', 'Recipe', 'in_carts_count', 'food', 'ShoppingCart', 'recipe'),
+    ('users', 'User', 'recipes_count', 'food', 'Recipe', 'author'),
+    ('users', 'User', 'followers_count', 'users', 'Subscription',
+     'subscriber'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for app, model, field, related_app, related, link in COUNTERS:
+        related = apps.get_model(related_app, related)
+        apps.get_model(app, model).objects.update(**{
+            field: Coalesce(
+                Subquery(
+                    related.objects.filter(
+                        **{link: OuterRef('pk')}
+                    ).order_by().values(link).annotate(
+                        count=Count('pk')
+                    ).values('count')
+                ),
+                0,
+            )
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0011_indexes'),
+        ('users', '0010_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в список покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from colorfield.fields import ColorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Upper
 
 from users.models import User
 
@@ -61,11 +62,62 @@ class Ingredient(models.Model):
                 name="unique_name_measurement_unit"
             ),
         )
+        indexes = (
+            models.Index(Upper('name'), name='food_ingredient_name_upper'),
+        )
 
     def __str__(self) -> str:
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet рецептов."""
+
+    def with_related(self):
+        """Загружает автора, теги и ингридиенты для сериализации."""
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+
+    def latest_per_author(self, limit):
+        """Оставляет не больше limit последних рецептов каждого автора."""
+        return self.filter(
+            pk__in=Recipe.objects.filter(
+                author=models.OuterRef('author')
+            ).order_by('-pub_date', '-id').values('pk')[:limit]
+        ).order_by('-pub_date', '-id')
+
+    def with_user_flags(self, user):
+        """Аннотирует is_favorited и is_in_shopping_cart для user."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+        )
+
+
 class Recipe(models.Model):
     """Класс рецепта."""
     author = models.ForeignKey(
@@ -84,6 +136,12 @@ class Recipe(models.Model):
         blank=True,
         upload_to='recipe/',
     )
+    image_renditions = models.JSONField(
+        'Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         'Описание рецепта',
     )
@@ -107,12 +165,34 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Добавлений в список покупок',
+        default=0,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         """Класс Meta для Recipe описание метаданных."""
         ordering = ('id',)
         verbose_name = 'рецепт'
         verbose_name_plural = 'рецепты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='food_recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='food_recipe_author_date_idx',
+            ),
+        )
 
     def __str__(self) -> str:
         return self.name
@@ -136,6 +216,12 @@ class TagRecipe(models.Model):
         ordering = ('id',)
         verbose_name = 'тег_рецепт'
         verbose_name_plural = 'теги_рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'tag'),
+                name='unique_recipe_tag'
+            ),
+        )
 
     def __str__(self) -> str:
         return f'{self.tag} {self.recipe}'
@@ -169,6 +255,12 @@ class IngredientRecipe(models.Model):
         ordering = ('id',)
         verbose_name = 'ингридиент_рецепт'
         verbose_name_plural = 'ингридиенты_рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'ingredient'),
+                name='unique_recipe_ingredient'
+            ),
+        )
 
     def __str__(self) -> str:
         return f'{self.ingredient} {self.recipe}'
@@ -234,3 +326,177 @@ class ShoppingCart(models.Model):
 
     def __str__(self) -> str:
         return f'{self.user} {self.recipe}'
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    """QuerySet сводного списка покупок."""
+
+    def expected(self):
+        """Суммы ингридиентов, посчитанные по корзинам пользователей."""
+        return IngredientRecipe.objects.filter(
+            recipe__shoppingcart__isnull=False
+        ).values(
+            'ingredient', user=models.F('recipe__shoppingcart__user')
+        ).annotate(total=models.Sum('amount')).order_by()
+
+    def drift(self):
+        """
+        Возвращает {(id пользователя, id ингридиента): (есть, должно быть)}
+        для позиций, расходящихся с корзинами.
+        """
+        actual = {
+            (row['user'], row['ingredient']): row['amount']
+            for row in self.values('user', 'ingredient', 'amount').order_by()
+        }
+        drift = {}
+        for row in self.expected().iterator():
+            key = (row['user'], row['ingredient'])
+            amount = actual.pop(key, 0)
+            if amount != row['total']:
+                drift[key] = (amount, row['total'])
+        for key, amount in actual.items():
+            drift[key] = (amount, 0)
+        return drift
+
+    def rebuild(self):
+        """Пересобирает списки покупок всех пользователей по корзинам."""
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                self.model(
+                    user_id=row['user'],
+                    ingredient_id=row['ingredient'],
+                    amount=row['total'],
+                )
+                for row in self.expected().iterator()
+            )
+
+    def apply(self, user_ids, amounts, sign=1):
+        """
+        Прибавляет (sign=1) или вычитает (sign=-1) количества
+        amounts {id ингридиента: количество} у пользователей user_ids.
+        Вызывается внутри транзакции, строки пользователей блокируются.
+        """
+        user_ids = sorted(set(user_ids))
+        amounts = {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in amounts.items() if amount
+        }
+        if not user_ids or not amounts:
+            return
+        list(
+            User.objects.select_for_update().filter(
+                pk__in=user_ids
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.filter(
+                user_id__in=user_ids, ingredient_id__in=amounts
+            )
+        }
+        created, updated, deleted = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, amount in amounts.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if amount > 0:
+                        created.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=amount,
+                        ))
+                    continue
+                item.amount += amount
+                if item.amount > 0:
+                    updated.append(item)
+                else:
+                    deleted.append(item.pk)
+        self.bulk_create(created)
+        self.bulk_update(updated, ('amount',))
+        self.filter(pk__in=deleted).delete()
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Пересчитывает списки покупок, где есть изменённый recipe."""
+        user_ids = ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('user_id', flat=True)
+        amounts = {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        }
+        self.apply(user_ids, amounts)
+
+
+def recipe_amounts(recipe):
+    """Возвращает {id ингридиента: количество} для recipe."""
+    return dict(
+        IngredientRecipe.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+class ShoppingListItem(models.Model):
+    """Класс суммы ингридиента в списке покупок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингридиент'
+    )
+    amount = models.PositiveIntegerField(
+        'Количество ингридиента',
+    )
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        """Класс Meta для ShoppingListItem описание метаданных."""
+        verbose_name = 'ПозицияСпискаПокупок'
+        verbose_name_plural = 'ПозицииСпискаПокупок'
+        ordering = ('id',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name="unique_user_ingredient_shoppinglistitem"
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.user} {self.ingredient}'
+
+
+class RecipeDocument(models.Model):
+    """Класс готового представления рецепта без данных пользователя."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document',
+        verbose_name='Рецепт'
+    )
+    data = models.JSONField(
+        'Представление рецепта',
+    )
+    updated = models.DateTimeField(
+        'Дата обновления',
+        auto_now=True,
+    )
+
+    class Meta:
+        """Класс Meta для RecipeDocument описание метаданных."""
+        verbose_name = 'документ_рецепта'
+        verbose_name_plural = 'документы_рецептов'
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id}'
@@ -0,0 +1,109 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from food.catalog import fold
+
+FTS_TABLE = 'food_recipe_fts'
+
+WORD = re.compile(r'\w+')
+
+
+def search_recipes(queryset, query):
+    """
+    Полнотекстовый поиск рецептов по названию и описанию.
+    Найденные рецепты аннотируются search_rank, чем больше, тем выше,
+    совпадения в названии весят больше, чем в описании.
+    PostgreSQL: колонка search_vector (tsvector, russian) с GIN индексом.
+    SQLite: таблица FTS5 food_recipe_fts.
+    Остальные базы: icontains без ранжирования.
+    """
+    words = WORD.findall(fold(query))
+    if not words:
+        return queryset.annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        ).none()
+    if connection.vendor == 'postgresql':
+        tsquery = "plainto_tsquery('russian', %s)"
+        return queryset.filter(
+            RawSQL(
+                f'food_recipe.search_vector @@ {tsquery}',
+                (' '.join(words),),
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'ts_rank(food_recipe.search_vector, {tsquery})',
+                (' '.join(words),),
+                output_field=FloatField(),
+            )
+        )
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{word}"*' for word in words)
+        return queryset.filter(
+            id__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                (match,),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, 2.5, 1.0) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                f'AND {FTS_TABLE}.rowid = food_recipe.id',
+                (match,),
+                output_field=FloatField(),
+            )
+        )
+    condition = Q()
+    for word in words:
+        condition &= Q(name__icontains=word) | Q(text__icontains=word)
+    return queryset.filter(condition).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    )
+
+
+def index_recipe(sender, instance, **kwargs):
+    """Обновляет запись рецепта в FTS5 после сохранения (SQLite)."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (instance.id,)
+        )
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+            'VALUES (%s, %s, %s)',
+            (instance.id, fold(instance.name), fold(instance.text)),
+        )
+
+
+def unindex_recipe(sender, instance, **kwargs):
+    """Удаляет запись рецепта из FTS5 после удаления (SQLite)."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (instance.id,)
+        )
+
+
+def rebuild_index():
+    """Заполняет FTS5 заново по всем рецептам (SQLite)."""
+    from food.models import Recipe
+
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+            'VALUES (%s, %s, %s)',
+            (
+                (recipe_id, fold(name), fold(text))
+                for recipe_id, name, text in Recipe.objects.values_list(
+                    'id', 'name', 'text'
+                ).iterator()
+            ),
+        )
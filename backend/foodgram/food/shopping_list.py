@@ -0,0 +1,84 @@
+from django.db import transaction
+
+from food.models import ShoppingCart, ShoppingListItem, recipe_amounts
+
+# Поля строк, от которых зависят списки покупок.
+TRACKED_FIELDS = {
+    'ShoppingCart': ('user_id', 'recipe_id'),
+    'IngredientRecipe': ('recipe_id', 'ingredient_id', 'amount'),
+}
+
+
+def cart_users(recipe_id):
+    return ShoppingCart.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True)
+
+
+def remember(sender, instance, raw=False, **kwargs):
+    """pre_save: запоминает значения изменяемой строки в базе."""
+    instance._shopping_list_old = None
+    if raw or instance.pk is None:
+        return
+    instance._shopping_list_old = sender.objects.filter(
+        pk=instance.pk
+    ).values(*TRACKED_FIELDS[sender.__name__]).first()
+
+
+def cart_saved(sender, instance, raw=False, **kwargs):
+    """Рецепт добавлен в корзину или запись корзины изменена (админка)."""
+    if raw:
+        return
+    old = getattr(instance, '_shopping_list_old', None)
+    if old == {'user_id': instance.user_id, 'recipe_id': instance.recipe_id}:
+        return
+    with transaction.atomic():
+        if old is not None:
+            ShoppingListItem.objects.apply(
+                (old['user_id'],), recipe_amounts(old['recipe_id']), sign=-1
+            )
+        ShoppingListItem.objects.apply(
+            (instance.user_id,), recipe_amounts(instance.recipe_id)
+        )
+
+
+def cart_deleted(sender, instance, **kwargs):
+    """
+    Рецепт убран из корзины. При удалении рецепта его ингридиенты
+    могли быть удалены раньше, тогда их уже вычел ingredient_deleted.
+    """
+    with transaction.atomic():
+        ShoppingListItem.objects.apply(
+            (instance.user_id,), recipe_amounts(instance.recipe_id), sign=-1
+        )
+
+
+def ingredient_saved(sender, instance, raw=False, **kwargs):
+    """Ингридиент рецепта добавлен или изменён."""
+    if raw:
+        return
+    old = getattr(instance, '_shopping_list_old', None)
+    with transaction.atomic():
+        if old is not None:
+            ShoppingListItem.objects.apply(
+                cart_users(old['recipe_id']),
+                {old['ingredient_id']: old['amount']},
+                sign=-1,
+            )
+        ShoppingListItem.objects.apply(
+            cart_users(instance.recipe_id),
+            {instance.ingredient_id: instance.amount},
+        )
+
+
+def ingredient_deleted(sender, instance, **kwargs):
+    """
+    Ингридиент убран из рецепта. При удалении рецепта корзины
+    с ним могли быть удалены раньше, тогда его уже вычел cart_deleted.
+    """
+    with transaction.atomic():
+        ShoppingListItem.objects.apply(
+            cart_users(instance.recipe_id),
+            {instance.ingredient_id: instance.amount},
+            sign=-1,
+        )
@@ -0,0 +1,13 @@
+from food.counters import drift, reconcile
+from food.images import process_recipe_image
+from jobs.queue import task
+
+task('food.process_recipe_image')(process_recipe_image)
+
+
+@task('food.reconcile_counters')
+def reconcile_counters():
+    """Исправляет разошедшиеся счётчики, возвращает их число."""
+    drifted = drift()
+    reconcile(drifted)
+    return len(drifted)
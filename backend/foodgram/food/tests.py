@@ -0,0 +1,139 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from food.catalog import ingredient_catalog, tag_registry, warm_catalogs
+from food.models import (Ingredient, IngredientRecipe, Recipe, ShoppingCart,
+                         ShoppingListItem, Tag)
+from users.models import User
+
+
+class CatalogTest(TestCase):
+    """Справочники в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('Мёд', 'Медовик', 'Яблочный мед', 'Соль'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+
+    def setUp(self):
+        # Снимки в памяти пережили откат предыдущего теста.
+        ingredient_catalog.invalidate()
+        tag_registry.invalidate()
+
+    def test_search(self):
+        names = [
+            ingredient.name for ingredient in ingredient_catalog.search('МЕД')
+        ]
+        self.assertEqual(names, ['Мёд', 'Медовик', 'Яблочный мед'])
+
+    def test_warm(self):
+        warm_catalogs()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(ingredient_catalog.all()), 4)
+            self.assertEqual(tag_registry.slugs(), ['breakfast'])
+
+    def test_invalidate(self):
+        self.assertEqual(tag_registry.slugs(), ['breakfast'])
+        Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        self.assertEqual(tag_registry.slugs(), ['breakfast', 'lunch'])
+
+
+class ShoppingListTest(TestCase):
+    """Сводный список покупок совпадает с корзинами при любой записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email='user@example.com', username='user'
+        )
+        cls.salt, cls.sugar = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Соль', 'Сахар')
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {number}',
+                text='Описание', cooking_time=10,
+            )
+            for number in range(2)
+        ]
+        for recipe in cls.recipes:
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=cls.salt, amount=5
+            )
+
+    def assertShoppingList(self, expected):
+        self.assertEqual(ShoppingListItem.objects.drift(), {})
+        self.assertEqual(
+            dict(ShoppingListItem.objects.filter(user=self.user).values_list(
+                'ingredient__name', 'amount'
+            )),
+            expected,
+        )
+
+    def test_cart(self):
+        first, second = self.recipes
+        cart = ShoppingCart.objects.create(user=self.user, recipe=first)
+        ShoppingCart.objects.create(user=self.user, recipe=second)
+        self.assertShoppingList({'Соль': 10})
+        cart.delete()
+        self.assertShoppingList({'Соль': 5})
+
+    def test_ingredients(self):
+        recipe = self.recipes[0]
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        row = IngredientRecipe.objects.get(recipe=recipe)
+        row.amount = 7
+        row.save()
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=self.sugar, amount=3
+        )
+        self.assertShoppingList({'Соль': 7, 'Сахар': 3})
+        row.delete()
+        self.assertShoppingList({'Сахар': 3})
+
+    def test_recipe_deleted(self):
+        first, second = self.recipes
+        ShoppingCart.objects.create(user=self.user, recipe=first)
+        ShoppingCart.objects.create(user=self.user, recipe=second)
+        first.delete()
+        self.assertShoppingList({'Соль': 5})
+
+
+class LoadIngredientsTest(TestCase):
+    """Загрузка ингридиентов не меняет существующие без --fix-names."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.honey = Ingredient.objects.create(
+            name='Мёд', measurement_unit='г'
+        )
+
+    def load(self, rows, *args):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', encoding='utf-8', delete=False
+        ) as file:
+            file.write('\n'.join(rows))
+        self.addCleanup(os.remove, file.name)
+        call_command('load_ingredients', file.name, *args,
+                     stdout=StringIO(), stderr=StringIO())
+
+    def names(self):
+        return sorted(Ingredient.objects.values_list('name', flat=True))
+
+    def test_existing_kept(self):
+        self.load(['мед,г', 'МЁД,г', 'Мёд,г'])
+        self.assertEqual(self.names(), ['МЁД', 'Мёд', 'мед'])
+        self.honey.refresh_from_db()
+        self.assertEqual(self.honey.name, 'Мёд')
+
+    def test_fix_names(self):
+        self.load(['Мед,г', 'МЕД,г'], '--fix-names')
+        self.assertEqual(self.names(), ['МЕД', 'Мед'])
+        self.honey.refresh_from_db()
+        self.assertEqual(self.honey.name, 'Мед')
@@ -0,0 +1,45 @@
+"""
+ASGI config for foodgram project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+import django
+from asgiref.sync import ThreadSensitiveContext
+from django.core.handlers.asgi import ASGIHandler
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+
+class FoodgramASGIHandler(ASGIHandler):
+    """
+    ASGIHandler, в котором запросы идут по foodgram.urls_asgi
+    с асинхронными версиями частых запросов на чтение.
+    Синхронный код каждого запроса (middleware, views DRF, ORM)
+    выполняется в своём потоке, как в Django 4.0: в Django 3.2 он
+    выполняется в одном потоке на весь процесс, и запросы ждут друг друга.
+    """
+    urlconf = 'foodgram.urls_asgi'
+
+    async def __call__(self, scope, receive, send):
+        async with ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = self.urlconf
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = FoodgramASGIHandler()
+
+from food.catalog import warm_catalogs  # noqa: E402
+
+warm_catalogs()
@@ -0,0 +1,120 @@
+import asyncio
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+from foodgram.routers import read_database, replicas
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+STICKY_COOKIE = 'db_primary'
+
+
+def token_key(request):
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(header) == 2 and header[0] == 'Token':
+        return header[1]
+    return None
+
+
+def is_sticky(request):
+    """Клиент недавно писал и должен читать с основной базы."""
+    if request.COOKIES.get(STICKY_COOKIE):
+        return True
+    key = token_key(request)
+    return key is not None and cache.get(f'db_primary:{key}') is not None
+
+
+def choose_database(request):
+    """Реплика для безопасного запроса или None - основная база."""
+    if is_sticky(request):
+        return None
+    return replicas.choose()
+
+
+def stick(request, response):
+    """
+    Следующие DATABASE_STICKY_SECONDS секунд клиент читает
+    с основной базы и видит свою запись, даже если реплика отстаёт.
+    Помечается и cookie, и токен: не все клиенты API хранят cookie.
+    """
+    window = settings.DATABASE_STICKY_SECONDS
+    response.set_cookie(
+        STICKY_COOKIE, '1', max_age=window, httponly=True, samesite='Lax'
+    )
+    key = token_key(request)
+    if key is not None:
+        cache.set(f'db_primary:{key}', 1, window)
+
+
+class ReplicaMiddleware:
+    """
+    Выбирает реплику для чтения в безопасных запросах,
+    если DATABASE_REPLICAS заданы и клиент недавно не писал.
+    Работает и в синхронном, и в асинхронном (ASGI) режиме.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django узнаёт, что middleware можно вызывать без потока.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        alias = None
+        if request.method in SAFE_METHODS:
+            alias = choose_database(request)
+        context = read_database.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(context)
+        if request.method not in SAFE_METHODS:
+            stick(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        alias = None
+        if request.method in SAFE_METHODS:
+            # Кэш и проверка реплики могут обратиться к базе.
+            alias = await sync_to_async(choose_database)(request)
+        # sync_to_async копирует контекст, запросы из потоков
+        # тоже идут в выбранную реплику.
+        context = read_database.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(context)
+        if request.method not in SAFE_METHODS:
+            await sync_to_async(stick)(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        """
+        Реплика отказала во время чтения: она помечается недоступной,
+        а view выполняется ещё раз с чтением из основной базы.
+        """
+        alias = read_database.get()
+        if alias is None or not isinstance(exception, DatabaseError):
+            return None
+        replicas.mark_down(alias)
+        connection = connections[alias]
+        if not connection.in_atomic_block:
+            connection.close()
+        read_database.set(None)
+        match = request.resolver_match
+        view = match.func
+        if asyncio.iscoroutinefunction(view):
+            # В ASGI process_exception вызывается в потоке.
+            view = async_to_sync(view)
+        return view(request, *match.args, **match.kwargs)
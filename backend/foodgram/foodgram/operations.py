@@ -0,0 +1,92 @@
+from django.db import migrations, transaction
+
+
+class ConcurrentlyMixin:
+    """
+    Операция, которая на PostgreSQL выполняется вне транзакции
+    (CONCURRENTLY, без блокировки записи в таблицу), а на остальных
+    базах как обычно, в своей транзакции.
+    Миграция с такими операциями должна быть atomic = False.
+    """
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return self.postgresql_forwards(app_label, schema_editor, to_state)
+        with transaction.atomic(using=schema_editor.connection.alias):
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return self.postgresql_backwards(
+                app_label, schema_editor, from_state
+            )
+        with transaction.atomic(using=schema_editor.connection.alias):
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+class AddIndexConcurrently(ConcurrentlyMixin, migrations.AddIndex):
+    """
+    Добавление индекса, на PostgreSQL CREATE INDEX CONCURRENTLY.
+    sql заменяет создание индекса на PostgreSQL, например для opclass.
+    """
+    def __init__(self, model_name, index, sql=None):
+        super().__init__(model_name, index)
+        self.sql = sql
+
+    def deconstruct(self):
+        name, args, kwargs = super().deconstruct()
+        if self.sql is not None:
+            kwargs['sql'] = self.sql
+        return name, args, kwargs
+
+    def postgresql_forwards(self, app_label, schema_editor, to_state):
+        if self.sql is not None:
+            schema_editor.execute(self.sql)
+            return
+        model = to_state.apps.get_model(app_label, self.model_name)
+        schema_editor.add_index(model, self.index, concurrently=True)
+
+    def postgresql_backwards(self, app_label, schema_editor, from_state):
+        schema_editor.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS '
+            f'{schema_editor.quote_name(self.index.name)}'
+        )
+
+
+class AddUniqueConstraintConcurrently(
+    ConcurrentlyMixin, migrations.AddConstraint
+):
+    """
+    Добавление UniqueConstraint по полям, на PostgreSQL уникальный
+    индекс строится CONCURRENTLY и затем становится ограничением.
+    """
+    def postgresql_forwards(self, app_label, schema_editor, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        table = schema_editor.quote_name(model._meta.db_table)
+        name = schema_editor.quote_name(self.constraint.name)
+        columns = ', '.join(
+            schema_editor.quote_name(model._meta.get_field(field).column)
+            for field in self.constraint.fields
+        )
+        schema_editor.execute(
+            f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON {table} ({columns})'
+        )
+        schema_editor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+            f'UNIQUE USING INDEX {name}'
+        )
+
+    def postgresql_backwards(self, app_label, schema_editor, from_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        schema_editor.execute(
+            'ALTER TABLE '
+            f'{schema_editor.quote_name(model._meta.db_table)} '
+            'DROP CONSTRAINT IF EXISTS '
+            f'{schema_editor.quote_name(self.constraint.name)}'
+        )
@@ -0,0 +1,118 @@
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+# База для чтения в текущем запросе, None - основная.
+read_database = contextvars.ContextVar('read_database', default=None)
+
+PRIMARY = 'default'
+
+# Токены читаются с основной базы: только что выданного токена
+# на реплике может ещё не быть. Кэш в базе тоже: версии и привязки
+# к основной базе должны действовать сразу.
+PRIMARY_MODELS = ('authtoken.token', 'django_cache.cacheentry')
+
+
+class ReplicaPool:
+    """
+    Реплики из DATABASE_REPLICAS с проверкой доступности.
+    Реплика проверяется не чаще раза в DATABASE_REPLICA_CHECK_INTERVAL
+    секунд запросом к django_migrations, на PostgreSQL ещё и по
+    отставанию репликации не больше DATABASE_REPLICA_MAX_LAG секунд.
+    Проверка ограничена DATABASE_REPLICA_CONNECT_TIMEOUT и
+    DATABASE_REPLICA_CHECK_TIMEOUT и идёт в одном потоке, остальные
+    запросы до её конца используют прежний результат.
+    Недоступная реплика не используется до следующей проверки.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor != 'postgresql':
+                    cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+                    return True
+                cursor.execute(
+                    'SET statement_timeout = %s',
+                    [int(settings.DATABASE_REPLICA_CHECK_TIMEOUT * 1000)],
+                )
+                try:
+                    cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+                    cursor.execute(
+                        'SELECT COALESCE(EXTRACT(EPOCH FROM now() '
+                        '- pg_last_xact_replay_timestamp()), 0)'
+                    )
+                    lag = cursor.fetchone()[0]
+                finally:
+                    cursor.execute('RESET statement_timeout')
+        except DatabaseError:
+            connection.close()
+            return False
+        return lag <= settings.DATABASE_REPLICA_MAX_LAG
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked_at, healthy = self._checked.get(alias, (None, False))
+            if (
+                checked_at is not None
+                and now - checked_at < settings.DATABASE_REPLICA_CHECK_INTERVAL
+            ):
+                return healthy
+            # Пока идёт проверка, другие потоки берут прежний результат.
+            self._checked[alias] = (now, healthy)
+        healthy = self.check(alias)
+        with self._lock:
+            self._checked[alias] = (now, healthy)
+        return healthy
+
+    def mark_down(self, alias):
+        """Реплика отказала во время запроса."""
+        with self._lock:
+            self._checked[alias] = (time.monotonic(), False)
+
+    def choose(self):
+        """Случайная доступная реплика или None, если таких нет."""
+        healthy = [
+            alias for alias in settings.DATABASE_REPLICAS
+            if self.is_healthy(alias)
+        ]
+        return random.choice(healthy) if healthy else None
+
+
+replicas = ReplicaPool()
+
+
+class ReplicaRouter:
+    """
+    Чтение идёт в реплику, выбранную ReplicaMiddleware для запроса,
+    запись и всё вне таких запросов (команды, фоновые задачи) -
+    в основную базу. Миграции применяются только к основной базе,
+    реплики получают схему репликацией.
+    """
+    def db_for_read(self, model, **hints):
+        # У модели кэша в базе нет label_lower.
+        label = f'{model._meta.app_label}.{model._meta.model_name}'
+        if label in PRIMARY_MODELS:
+            return PRIMARY
+        # Связанные объекты читаются из той же базы, что и объект.
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return read_database.get() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -30,10 +30,12 @@ INSTALLED_APPS = [
     'food',
     'api',
     'users',
+    'jobs',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,6 +76,61 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения через запятую: хосты PostgreSQL с теми же
+# базой и пользователем или, для SQLite, пути к копиям файла базы.
+REPLICA_SETTING = (
+    'NAME' if str(DATABASES['default']['ENGINE']).endswith('sqlite3')
+    else 'HOST'
+)
+# Недоступная реплика не должна задерживать запрос дольше
+# этого числа секунд: время на соединение и на проверку реплики.
+DATABASE_REPLICA_CONNECT_TIMEOUT = 2
+
+DATABASE_REPLICA_CHECK_TIMEOUT = 1
+
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        REPLICA_SETTING: replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    if REPLICA_SETTING == 'HOST':
+        DATABASES[f'replica{number}']['OPTIONS'] = {
+            'connect_timeout': DATABASE_REPLICA_CONNECT_TIMEOUT,
+        }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ('foodgram.routers.ReplicaRouter',)
+
+DATABASE_STICKY_SECONDS = 5
+
+DATABASE_REPLICA_CHECK_INTERVAL = 5
+
+DATABASE_REPLICA_MAX_LAG = 10
+
+
+# Кэш, общий для всех процессов (воркеры сервера и jobs_worker):
+# через него процессы узнают о сбросе кэша токенов, справочников
+# и счётчиков и о привязке клиента к основной базе.
+# По умолчанию таблица в базе (python manage.py createcachetable),
+# CACHE_BACKEND и CACHE_LOCATION задают другой общий кэш, например memcached.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'django_cache'),
+    }
+}
+
+# Сколько секунд процесс доверяет прочитанной из общего кэша версии
+# справочника или пользователя, не перечитывая её: изменения из других
+# процессов видны с этой задержкой, зато запросы не читают кэш каждый раз.
+CACHE_VERSION_CHECK_INTERVAL = 1
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -109,7 +166,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageNumberAsLimitOffset',
     'PAGE_SIZE': 6,
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
@@ -121,8 +178,51 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+IMAGE_MAX_SIZE = 2048
+
+IMAGE_RENDITION_WIDTHS = (320, 640, 1280)
+
+IMAGE_QUALITY = 82
+
 AUTH_USER_MODEL = 'users.User'
 
+AUTHENTICATION_BACKENDS = ('users.backends.EmailBackend',)
+
+PASSWORD_HASHING_WORKERS = 2
+
+PASSWORD_HASHING_QUEUE_SIZE = 16
+
+PASSWORD_HASHING_QUEUE_TIMEOUT = 2
+
+
+RECIPES_LIMIT = 3
+
+CATALOG_TTL = 300
+
+PAGINATION_COUNT_TTL = 60
+
+PAGINATION_ESTIMATE_THRESHOLD = 10000
+
+AUTH_TOKEN_CACHE_SIZE = 10000
+
+AUTH_TOKEN_CACHE_TTL = 300
+
+AUTH_TOKEN_CACHE_SHARED = (
+    os.getenv('AUTH_TOKEN_CACHE_SHARED', 'False') == 'True'
+)
+
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False') == 'True'
+
+JOBS_WORKERS = 2
+
+JOBS_MAX_ATTEMPTS = 3
+
+JOBS_RETRY_DELAY = 10
+
+JOBS_TIMEOUT = 600
+
+JOBS_POLL_INTERVAL = 1
+
 
 DJOSER = {
     'SEND_ACTIVATION_EMAIL': False,
@@ -0,0 +1,7 @@
+from django.contrib import admin
+from django.urls import include, path
+
+urlpatterns = [
+    path('api/', include('api.urls_asgi', namespace='api')),
+    path('admin/', admin.site.urls),
+]
@@ -0,0 +1,22 @@
+from django.contrib import admin
+
+from api.pagination import EstimatedCountPaginator
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Админка фоновых задач, только для просмотра."""
+    list_display = ('id', 'name', 'status', 'priority', 'attempts',
+                    'run_at', 'finished', 'user')
+    list_filter = ('status', 'name')
+    search_fields = ('=dedup_key',)
+    list_select_related = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs.queue import claim, requeue_stale
+from jobs.worker import execute, setup_process
+
+
+class Command(BaseCommand):
+    """
+    Обработчик фоновых задач из таблицы jobs_job.
+    Запуск python manage.py jobs_worker [--workers N] [--processes]
+    [--burst]. Останавливается по SIGTERM или SIGINT,
+    дожидаясь выполняющихся задач.
+    """
+    help = 'Выполняет фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.JOBS_WORKERS,
+            help='Сколько задач выполнять одновременно',
+        )
+        parser.add_argument(
+            '--processes',
+            action='store_true',
+            help='Пул процессов вместо пула потоков, для задач, '
+                 'нагружающих процессор',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Завершиться, когда в очереди не останется готовых задач',
+        )
+
+    def get_executor(self, workers, processes):
+        if not processes:
+            return ThreadPoolExecutor(workers)
+        # Новые процессы не должны получить соединения с базой родителя.
+        connections.close_all()
+        return ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=setup_process,
+        )
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def report(self, futures):
+        for future in futures:
+            try:
+                job_id, status = future.result()
+            except Exception as error:
+                # Задача останется в статусе running до requeue_stale.
+                self.stderr.write(f'Ошибка обработчика: {error!r}')
+                continue
+            if self.verbosity > 0:
+                self.stdout.write(f'job={job_id}: {status}')
+
+    def handle(self, *args, **kwargs):
+        workers = kwargs['workers']
+        if workers < 1:
+            raise CommandError('--workers должен быть больше 0')
+        self.verbosity = kwargs['verbosity']
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        executor = self.get_executor(workers, kwargs['processes'])
+        running = set()
+        checked = 0
+        while not self.stopping:
+            if time.monotonic() - checked > settings.JOBS_POLL_INTERVAL * 60:
+                requeue_stale()
+                checked = time.monotonic()
+            ids = []
+            if len(running) < workers:
+                ids = claim(worker, workers - len(running))
+            running.update(executor.submit(execute, job_id) for job_id in ids)
+            if not running:
+                if kwargs['burst']:
+                    break
+                time.sleep(settings.JOBS_POLL_INTERVAL)
+                continue
+            done, running = wait(
+                running,
+                timeout=0 if ids else settings.JOBS_POLL_INTERVAL,
+                return_when=FIRST_COMPLETED,
+            )
+            self.report(done)
+        executor.shutdown(wait=True)
+        self.report(running)
@@ -0,0 +1,122 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import User
+
+
+class Job(models.Model):
+    """Класс фоновой задачи."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'в очереди'),
+        (RUNNING, 'выполняется'),
+        (DONE, 'выполнена'),
+        (FAILED, 'ошибка'),
+    )
+    name = models.CharField(
+        'Задача',
+        max_length=100,
+    )
+    args = models.JSONField(
+        'Аргументы',
+        default=list,
+        blank=True,
+    )
+    priority = models.SmallIntegerField(
+        'Приоритет',
+        default=0,
+        help_text='Задачи с большим приоритетом выполняются раньше',
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    dedup_key = models.CharField(
+        'Ключ дедупликации',
+        max_length=200,
+        null=True,
+        blank=True,
+        help_text='В очереди может быть одна задача с таким ключом',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Попыток',
+        default=0,
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток',
+        default=3,
+    )
+    run_at = models.DateTimeField(
+        'Выполнить не раньше',
+        default=timezone.now,
+    )
+    created = models.DateTimeField(
+        'Создана',
+        auto_now_add=True,
+    )
+    started = models.DateTimeField(
+        'Начата',
+        null=True,
+        blank=True,
+    )
+    finished = models.DateTimeField(
+        'Завершена',
+        null=True,
+        blank=True,
+    )
+    worker = models.CharField(
+        'Обработчик',
+        max_length=100,
+        blank=True,
+    )
+    result = models.JSONField(
+        'Результат',
+        null=True,
+        blank=True,
+    )
+    error = models.TextField(
+        'Ошибка',
+        blank=True,
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name='Пользователь',
+    )
+
+    class Meta:
+        """Класс Meta для Job описание метаданных."""
+        ordering = ('-id',)
+        verbose_name = 'задача'
+        verbose_name_plural = 'задачи'
+        indexes = (
+            models.Index(
+                fields=('-priority', 'run_at', 'id'),
+                condition=Q(status='queued'),
+                name='jobs_job_queued_idx',
+            ),
+            models.Index(
+                fields=('started',),
+                condition=Q(status='running'),
+                name='jobs_job_running_idx',
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('dedup_key',),
+                condition=Q(status='queued'),
+                name='jobs_job_unique_queued_key',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.name} #{self.id}'
@@ -0,0 +1,163 @@
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job
+
+registry = {}
+
+
+def task(name):
+    """Регистрирует функцию как задачу name для enqueue."""
+    def register(func):
+        registry[name] = func
+        return func
+    return register
+
+
+def enqueue(name, *args, priority=0, dedup_key=None, user_id=None,
+            delay=0, max_attempts=None):
+    """
+    Ставит задачу в очередь в текущей транзакции, обработчик увидит её
+    после фиксации. Если в очереди уже есть задача с dedup_key,
+    новая не создаётся и возвращается существующая.
+    При JOBS_EAGER задача выполняется сразу после фиксации, без обработчика.
+    """
+    if name not in registry:
+        raise ValueError(f'Нет задачи {name}')
+    if dedup_key is not None:
+        job = Job.objects.filter(
+            dedup_key=dedup_key, status=Job.QUEUED
+        ).first()
+        if job is not None:
+            return job
+    job = Job(
+        name=name,
+        args=list(args),
+        priority=priority,
+        dedup_key=dedup_key,
+        user_id=user_id,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        if dedup_key is None:
+            raise
+        return Job.objects.filter(
+            dedup_key=dedup_key, status=Job.QUEUED
+        ).first() or enqueue(
+            name, *args, priority=priority, dedup_key=dedup_key,
+            user_id=user_id, delay=delay, max_attempts=max_attempts,
+        )
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: run_eager(job.id))
+    return job
+
+
+def ready_jobs():
+    return Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=timezone.now()
+    ).order_by('-priority', 'run_at', 'id')
+
+
+def start(queryset, worker):
+    return queryset.update(
+        status=Job.RUNNING,
+        started=timezone.now(),
+        worker=worker,
+        attempts=F('attempts') + 1,
+    )
+
+
+def claim(worker, limit):
+    """
+    Забирает до limit готовых задач в порядке приоритета.
+    На PostgreSQL строки блокируются с SKIP LOCKED, на остальных базах
+    задача забирается условным UPDATE по статусу.
+    Возвращает id забранных задач.
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(ready_jobs().select_for_update(
+                skip_locked=True
+            ).values_list('id', flat=True)[:limit])
+            start(Job.objects.filter(id__in=ids), worker)
+        return ids
+    ids = []
+    for job_id in ready_jobs().values_list('id', flat=True)[:limit * 2]:
+        if start(Job.objects.filter(id=job_id, status=Job.QUEUED), worker):
+            ids.append(job_id)
+            if len(ids) == limit:
+                break
+    return ids
+
+
+def fail(job, error):
+    """
+    Неудачная попытка: задача снова ставится в очередь с задержкой,
+    растущей вдвое с каждой попыткой, или завершается с ошибкой.
+    """
+    now = timezone.now()
+    running = Job.objects.filter(id=job.id, status=Job.RUNNING)
+    if job.attempts < job.max_attempts:
+        try:
+            with transaction.atomic():
+                return running.update(
+                    status=Job.QUEUED,
+                    run_at=now + timedelta(
+                        seconds=settings.JOBS_RETRY_DELAY
+                        * 2 ** (job.attempts - 1)
+                    ),
+                    worker='',
+                    error=error,
+                )
+        except IntegrityError:
+            # В очереди уже есть такая же задача, она и выполнит работу.
+            pass
+    return running.update(status=Job.FAILED, finished=now, error=error)
+
+
+def run_job(job_id):
+    """Выполняет забранную задачу, возвращает её новый статус."""
+    job = Job.objects.get(id=job_id)
+    try:
+        func = registry.get(job.name)
+        if func is None:
+            raise LookupError(f'Нет задачи {job.name}')
+        result = func(*job.args)
+    except Exception:
+        fail(job, traceback.format_exc())
+    else:
+        Job.objects.filter(id=job.id, status=Job.RUNNING).update(
+            status=Job.DONE,
+            finished=timezone.now(),
+            result=result,
+            error='',
+        )
+    return Job.objects.values_list('status', flat=True).get(id=job.id)
+
+
+def run_eager(job_id):
+    if start(Job.objects.filter(id=job_id, status=Job.QUEUED), 'eager'):
+        run_job(job_id)
+
+
+def requeue_stale():
+    """
+    Задачи, которые выполняются дольше JOBS_TIMEOUT (обработчик
+    остановлен или завис), считаются неудачной попыткой.
+    """
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        started__lt=timezone.now() - timedelta(seconds=settings.JOBS_TIMEOUT),
+    )
+    for job in stale:
+        fail(job, f'Не завершена за {settings.JOBS_TIMEOUT} с')
+    return len(stale)
@@ -0,0 +1,24 @@
+"""
+Функции для пула потоков или процессов обработчика задач.
+Модуль импортируется в новом процессе до django.setup(),
+поэтому Django и модели импортируются внутри функций.
+"""
+
+
+def setup_process():
+    import django
+
+    django.setup()
+
+
+def execute(job_id):
+    """Выполняет задачу в потоке или процессе пула."""
+    from django.db import close_old_connections
+
+    from jobs.queue import run_job
+
+    close_old_connections()
+    try:
+        return job_id, run_job(job_id)
+    finally:
+        close_old_connections()
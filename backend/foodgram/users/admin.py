@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from api.pagination import EstimatedCountPaginator
 from users.models import Subscription, User
 
 
@@ -7,11 +8,15 @@ from users.models import Subscription, User
 class UserAdmin(admin.ModelAdmin):
     list_display = ('pk',
                     'username',
-                    'email'
+                    'email',
+                    'recipes_count',
+                    'followers_count',
                     )
-    list_filter = ('username', 'email')
+    list_filter = ('role', 'is_active')
     list_editable = ('username',)
-    search_fields = ('username',)
+    search_fields = ('username', 'email')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто)))-'
 
 
@@ -21,4 +26,8 @@ class SubscriptionAdmin(admin.ModelAdmin):
                     'user',
                     'subscriber'
                     )
+    list_select_related = ('user', 'subscriber')
+    autocomplete_fields = ('user', 'subscriber')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто)))-'
@@ -0,0 +1,29 @@
+from django.contrib.auth.backends import ModelBackend
+
+from users.models import User
+from users.passwords import hash_password, verify_password
+
+
+class EmailBackend(ModelBackend):
+    """
+    ModelBackend, который ищет пользователя одним запросом по email
+    и проверяет пароль в пуле password_hashers.
+    """
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except (User.DoesNotExist, User.MultipleObjectsReturned):
+            # Как ModelBackend: по времени ответа не видно, есть ли email.
+            hash_password(password)
+            return None
+        valid, must_update = verify_password(password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.password = hash_password(password)
+            user.save(update_fields=('password',))
+        return user
@@ -0,0 +1,135 @@
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+
+PASSWORD = 'Bench-password-1'
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочная проверка входа и регистрации вместе с чтением.
+    Потоки writers регистрируют пользователя, входят и меняют пароль,
+    потоки readers читают рецепты и /users/me/. Запросы идут
+    в приложение внутри процесса, как в потоках gunicorn gthread.
+    Созданные пользователи удаляются.
+    Запуск python manage.py auth_benchmark [--duration N]
+    [--readers N] [--writers N] [--no-pool].
+    """
+    help = 'Измеряет пропускную способность auth при смешанной нагрузке'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument(
+            '--no-pool',
+            action='store_true',
+            help='Хешировать пароли в потоке запроса, для сравнения',
+        )
+
+    def record(self, name, started, response):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.timings[name].append(elapsed)
+            if response.status_code >= 400:
+                self.errors[name][response.status_code] += 1
+
+    def call(self, client, name, method, url, **kwargs):
+        started = time.perf_counter()
+        response = getattr(client, method)(url, **kwargs)
+        self.record(name, started, response)
+        return response
+
+    def writer(self):
+        client = Client()
+        while time.monotonic() < self.deadline:
+            email = f'{self.prefix}{uuid.uuid4().hex[:12]}@bench.local'
+            self.call(client, 'signup', 'post', '/api/users/', data={
+                'email': email,
+                'username': email.split('@')[0],
+                'first_name': 'bench',
+                'last_name': 'bench',
+                'password': PASSWORD,
+            })
+            response = self.call(
+                client, 'login', 'post', '/api/auth/token/login/',
+                data={'email': email, 'password': PASSWORD},
+            )
+            if response.status_code != 200:
+                continue
+            self.call(
+                client, 'set_password', 'post', '/api/users/set_password/',
+                data={'current_password': PASSWORD,
+                      'new_password': PASSWORD + '2'},
+                HTTP_AUTHORIZATION=f'Token {response.json()["auth_token"]}',
+            )
+        connections.close_all()
+
+    def reader(self, token):
+        client = Client()
+        while time.monotonic() < self.deadline:
+            self.call(client, 'recipes', 'get', '/api/recipes/')
+            self.call(
+                client, 'me', 'get', '/api/users/me/',
+                HTTP_AUTHORIZATION=f'Token {token}',
+            )
+        connections.close_all()
+
+    def run(self, readers, writers, duration):
+        reader_user = User.objects.create_user(
+            username=f'{self.prefix}reader',
+            email=f'{self.prefix}reader@bench.local',
+            password=PASSWORD,
+        )
+        token = Token.objects.create(user=reader_user).key
+        self.deadline = time.monotonic() + duration
+        threads = [
+            threading.Thread(target=self.reader, args=(token,))
+            for _ in range(readers)
+        ] + [threading.Thread(target=self.writer) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def report(self, duration):
+        for name, timings in sorted(self.timings.items()):
+            timings.sort()
+            p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+            errors = ', '.join(
+                f'{code}: {count}'
+                for code, count in sorted(self.errors[name].items())
+            )
+            self.stdout.write(
+                f'{name:>12}: {len(timings) / duration:8.1f} rps, '
+                f'p50 {statistics.median(timings) * 1000:7.1f} мс, '
+                f'p95 {p95 * 1000:7.1f} мс'
+                f'{", ошибки " + errors if errors else ""}'
+            )
+
+    def handle(self, *args, **kwargs):
+        self.prefix = f'bench{uuid.uuid4().hex[:6]}'
+        self.lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        overrides = {}
+        if kwargs['no_pool']:
+            overrides['PASSWORD_HASHING_WORKERS'] = 0
+        try:
+            with override_settings(**overrides):
+                self.run(
+                    kwargs['readers'], kwargs['writers'], kwargs['duration']
+                )
+        finally:
+            User.objects.filter(username__startswith=self.prefix).delete()
+        self.report(kwargs['duration'])
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:17
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_remove_subscription_нельзя на себя'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='subscription',
+            options={'ordering': ('-id',), 'verbose_name': 'Подписка', 'verbose_name_plural': 'Подписки'},
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+from foodgram.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0007_subscription_ordering'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='subscription',
+            index=models.Index(fields=['user', '-id'], name='users_subscription_user_idx'),
+        ),
+    ]
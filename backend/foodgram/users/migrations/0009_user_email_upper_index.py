@@ -0,0 +1,19 @@
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+from foodgram.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0008_subscription_user_index'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(Upper('email'), name='users_user_email_upper'),
+        ),
+    ]
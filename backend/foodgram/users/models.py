@@ -1,7 +1,7 @@
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Q
+from django.db.models.functions import Upper
 
 USER = 'user'
 ADMIN = 'admin'
@@ -14,10 +14,13 @@ CHOICES = (
 
 class CustomUserManager(UserManager):
     """Получения email."""
-    def get_by_natural_key(self, username):
-        return self.get(
-            Q(**{self.model.USERNAME_FIELD: username})
-            | Q(**{self.model.EMAIL_FIELD: username})
+    def get_by_natural_key(self, email):
+        """
+        Пользователь по email без учёта регистра и пробелов по краям,
+        один запрос по индексу users_user_email_upper.
+        """
+        return self.annotate(email_upper=Upper('email')).get(
+            email_upper=email.strip().upper()
         )
 
 
@@ -52,10 +55,21 @@ class User(AbstractUser):
         max_length=15,
         default=USER,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        editable=False,
+    )
 
     objects = CustomUserManager()
 
-    USERNAME_FIELDS = 'email'
+    USERNAME_FIELD = 'email'
+    REQUIRED_FIELDS = ('username',)
 
     @property
     def is_user(self):
@@ -71,6 +85,9 @@ class User(AbstractUser):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('id',)
+        indexes = (
+            models.Index(Upper('email'), name='users_user_email_upper'),
+        )
 
 
 class Subscription(models.Model):
@@ -92,6 +109,13 @@ class Subscription(models.Model):
         """Класс Meta для Subscription описание метаданных."""
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        ordering = ('-id',)
+        indexes = (
+            models.Index(
+                fields=('user', '-id'),
+                name='users_subscription_user_idx',
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('user', 'subscriber'),
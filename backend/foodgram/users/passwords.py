@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    status_code = 503
+    default_detail = 'Сервер перегружен, повторите попытку позже.'
+    default_code = 'password_hashing_busy'
+
+
+class PasswordHasherPool:
+    """
+    Пул из PASSWORD_HASHING_WORKERS потоков для хеширования и проверки
+    паролей. Одновременно выполняется не больше PASSWORD_HASHING_WORKERS
+    задач, ещё PASSWORD_HASHING_QUEUE_SIZE ждут в очереди; если очередь
+    полна или задача не началась за PASSWORD_HASHING_QUEUE_TIMEOUT
+    секунд, запрос получает 503 вместо того, чтобы занимать поток.
+    При PASSWORD_HASHING_WORKERS = 0 пароли проверяются в потоке запроса.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+    def _start(self):
+        # Пул создаётся при первом обращении, уже в процессе-обработчике.
+        with self._lock:
+            if self._executor is None:
+                workers = settings.PASSWORD_HASHING_WORKERS
+                self._slots = threading.BoundedSemaphore(
+                    workers + settings.PASSWORD_HASHING_QUEUE_SIZE
+                )
+                self._executor = ThreadPoolExecutor(
+                    workers, thread_name_prefix='password'
+                )
+        return self._executor, self._slots
+
+    def run(self, func, *args):
+        if not settings.PASSWORD_HASHING_WORKERS:
+            return func(*args)
+        executor, slots = self._start()
+        if not slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            started = threading.Event()
+
+            def call():
+                started.set()
+                return func(*args)
+
+            future = executor.submit(call)
+            if not started.wait(
+                settings.PASSWORD_HASHING_QUEUE_TIMEOUT
+            ) and future.cancel():
+                raise PasswordHashingBusy()
+            return future.result()
+        finally:
+            slots.release()
+
+
+password_hashers = PasswordHasherPool()
+
+
+def check(raw_password, encoded):
+    updates = []
+    valid = check_password(raw_password, encoded, setter=updates.append)
+    return valid, bool(updates)
+
+
+def hash_password(raw_password):
+    """make_password в пуле."""
+    return password_hashers.run(make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    """
+    check_password в пуле. Возвращает (пароль верный,
+    хеш нужно пересчитать новым алгоритмом или числом итераций).
+    """
+    return password_hashers.run(check, raw_password, encoded)